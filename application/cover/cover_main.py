@@ -26,28 +26,50 @@
     THE SOFTWARE.
 """
 
-import imghdr
+import io
 import logging
 import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from multiprocessing import Pool
 
-from mutagen.flac import FLAC, Picture
-from mutagen.id3 import APIC, ID3
-from mutagen.mp3 import MP3
-from PIL import Image
+import numpy as np
+from cykooz.resizer import FilterType, ResizeAlg, Resizer
+from mutagen.flac import Picture
+from mutagen.id3 import ID3
+from PIL import Image, features
 
 from application.database.database_helper import (
-    close_connection,
     close_cursor,
+    commit,
     create_cursor,
+    ensure_album_cover_columns,
     execute_query,
+    open_cursor,
+    scalar_row,
 )
+from application.utils.config_loader import load_config
 
 logger = logging.getLogger(__name__)
+_resizer = None
+_tile = None
+# Connection of a mosaic worker process, reused for all its cached covers
+_worker_conn = None
+
+# Cover names in lookup order, compared with os.path.normcase so detection,
+# removal and lookup all match case-insensitively on Windows only
+COVER_FILE_NAMES = ("cover.png", "cover.jpg", "cover.jpeg")
+FLAC_PICTURE_BLOCK = 6
 
 
 def detect_image_format(image_data):
     """Detect the format of the image (e.g., jpeg, png)."""
-    return imghdr.what(None, h=image_data)
+    if image_data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if image_data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    return None
 
 
 def ensure_cover_in_folder(folder_path, remove_existing=False):
@@ -56,96 +78,269 @@ def ensure_cover_in_folder(folder_path, remove_existing=False):
         logger.error(f"Invalid folder path: {folder_path}")
         return
 
+    # Collect existing covers and audio files in a single directory pass
+    existing_covers = []
+    audio_files = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if os.path.normcase(entry.name) in COVER_FILE_NAMES:
+                existing_covers.append(entry.path)
+            elif entry.name.lower().endswith((".mp3", ".flac")):
+                audio_files.append(entry.path)
+
     # Remove existing covers if the option is enabled
     if remove_existing:
         logger.debug(f"Removing existing covers in {folder_path}...")
-        for ext in ["jpg", "jpeg", "png"]:
-            existing_cover = os.path.join(folder_path, f"cover.{ext}")
-            if os.path.exists(existing_cover):
-                os.remove(existing_cover)
-                logger.debug(f"Removed existing cover: {existing_cover}")
-    else:
-        # Check if a cover image already exists
-        for ext in ["jpg", "jpeg", "png"]:
-            existing_cover = os.path.join(folder_path, f"cover.{ext}")
-            if os.path.exists(existing_cover):
-                logger.debug(f"Cover already exists: {existing_cover}")
-                return
+        for existing_cover in existing_covers:
+            os.remove(existing_cover)
+            logger.debug(f"Removed existing cover: {existing_cover}")
+    elif existing_covers:
+        logger.debug(f"Cover already exists: {existing_covers[0]}")
+        return
 
     # Scan audio files for embedded cover art
     logger.debug(f"Checking audio files in {folder_path} for embedded cover art...")
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
-        if file_path.lower().endswith((".mp3", ".flac")):
-            cover_data = extract_cover_from_audio(file_path)
-            if cover_data:
-                # Detect image format
-                image_format = detect_image_format(cover_data)
-                if image_format in ["jpeg", "png"]:
-                    extension = "jpg" if image_format == "jpeg" else "png"
-                    cover_path = os.path.join(folder_path, f"cover.{extension}")
-                    with open(cover_path, "wb") as f:
-                        f.write(cover_data)
-                    logger.info(f"Cover extracted and saved to: {cover_path}")
-                else:
-                    logger.error(f"Unsupported cover format found in {file_path}.")
-                return
+    for file_path in audio_files:
+        cover_data = extract_cover_from_audio(file_path)
+        if cover_data:
+            # Detect image format
+            image_format = detect_image_format(cover_data)
+            if image_format in ["jpeg", "png"]:
+                extension = "jpg" if image_format == "jpeg" else "png"
+                cover_path = os.path.join(folder_path, f"cover.{extension}")
+                with open(cover_path, "wb") as f:
+                    f.write(cover_data)
+                logger.info(f"Cover extracted and saved to: {cover_path}")
+            else:
+                logger.error(f"Unsupported cover format found in {file_path}.")
+            return
 
     print(f"No cover art found in {folder_path}.")
 
 
+def _read_flac_picture(file_path):
+    """Walk the FLAC metadata blocks and return the first embedded picture."""
+    with open(file_path, "rb") as f:
+        header = f.read(10)
+        if header[:3] == b"ID3":
+            # Skip a leading ID3v2 tag (syncsafe size, optional footer)
+            size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            f.seek(10 + size + (10 if header[5] & 0x10 else 0))
+        else:
+            f.seek(0)
+        if f.read(4) != b"fLaC":
+            return None
+
+        while True:
+            block_header = f.read(4)
+            if len(block_header) < 4:
+                return None
+            is_last = block_header[0] & 0x80
+            block_type = block_header[0] & 0x7F
+            length = int.from_bytes(block_header[1:4], "big")
+            if block_type == FLAC_PICTURE_BLOCK:
+                return Picture(f.read(length)).data
+            if is_last:
+                return None  # Audio frames follow, no picture present
+            f.seek(length, os.SEEK_CUR)
+
+
 def extract_cover_from_audio(file_path):
     """Extract cover art from an audio file."""
     try:
         if file_path.lower().endswith(".mp3"):
-            audio = MP3(file_path, ID3=ID3)
-            for tag in audio.tags.values():
-                if isinstance(tag, APIC):  # APIC = Attached Picture
-                    return tag.data  # Return binary data of the cover
+            # Only parse the ID3 tag, the MPEG frames are not needed
+            pictures = ID3(file_path).getall("APIC")  # APIC = Attached Picture
+            if pictures:
+                return pictures[0].data  # Return binary data of the cover
         elif file_path.lower().endswith(".flac"):
-            audio = FLAC(file_path)
-            for picture in audio.pictures:
-                if isinstance(picture, Picture):
-                    return picture.data  # Return binary data of the cover
+            return _read_flac_picture(file_path)
     except Exception as e:
         logger.error(f"Error processing file {file_path}: {e}")
     return None
 
 
 def get_cover_path(folder_path):
-    """Check for cover.png or cover.jpg in the folder and return the path."""
-    for ext in ["png", "jpg"]:
-        cover_path = os.path.join(folder_path, f"cover.{ext}")
-        if os.path.exists(cover_path):
-            return cover_path
+    """Return the path of the cover.png, cover.jpg or cover.jpeg in the folder."""
+    # One directory listing instead of a stat per candidate name, normcase
+    # keeps the case-insensitive match of os.path.exists on Windows
+    try:
+        with os.scandir(folder_path) as entries:
+            paths = {os.path.normcase(entry.name): entry.path for entry in entries}
+    except OSError:
+        return None
+    for name in COVER_FILE_NAMES:
+        if name in paths:
+            return paths[name]
     return None
 
 
+def _prepare_album_cover(folder_path, remove_existing=False):
+    """Ensure an album folder has a cover file and return its path."""
+    ensure_cover_in_folder(folder_path, remove_existing)
+    return folder_path, get_cover_path(folder_path)
+
+
 def get_album_covers(perform_action=True, remove_existing=False):
     """Retrieve all album covers from the database."""
-    cursor = create_cursor()
+    cursor = create_cursor(row_factory=scalar_row)
+    ensure_album_cover_columns(cursor)
+    if not perform_action:
+        covers = _get_indexed_covers(cursor)
+        close_cursor(cursor)
+        return covers
+
     query = "SELECT folder_path FROM albums WHERE folder_path IS NOT NULL;"
-    results = execute_query(cursor, query, fetch_all=True)
-    covers = []
-    for row in results:
-        folder_path = row[0]
-        if perform_action:
-            ensure_cover_in_folder(folder_path, remove_existing)
+    folder_paths = execute_query(cursor, query, fetch_all=True)
 
-        cover_path = get_cover_path(folder_path)
+    # Workers only touch the file system, the database writes stay in this process
+    with Pool(os.cpu_count()) as pool:
+        prepared = list(
+            pool.imap_unordered(
+                partial(_prepare_album_cover, remove_existing=remove_existing),
+                folder_paths,
+                chunksize=16,
+            )
+        )
 
-        if cover_path and os.path.exists(cover_path):
+    covers = []
+    for folder_path, cover_path in prepared:
+        if cover_path:
             covers.append(cover_path)
+            # Cache the cover in the database so the mosaic skips the file system
+            with open(cover_path, "rb") as f:
+                execute_query(
+                    cursor,
+                    "UPDATE albums SET cover_blob = ?, cover_path = ? WHERE folder_path = ?;",
+                    (f.read(), cover_path, folder_path),
+                )
         else:
             logger.error(f"Can not find: {folder_path}")
+            # The cover is gone, drop what was cached for it before
+            execute_query(
+                cursor,
+                "UPDATE albums SET cover_blob = NULL, cover_path = NULL WHERE folder_path = ?;",
+                (folder_path,),
+            )
+    commit()
     close_cursor(cursor)
-    close_connection()
     return covers
 
 
+def _get_indexed_covers(cursor):
+    """Return the cover paths stored in albums, indexing albums not indexed yet."""
+    # Albums imported since the last call have no cover_path yet, scan only those
+    results = execute_query(
+        cursor,
+        "SELECT folder_path FROM albums "
+        "WHERE cover_path IS NULL AND folder_path IS NOT NULL;",
+        fetch_all=True,
+    )
+    updates = []
+    for folder_path in results or []:
+        cover_path = get_cover_path(folder_path)
+        if cover_path:
+            updates.append((cover_path, folder_path))
+        else:
+            logger.error(f"Can not find: {folder_path}")
+    if updates:
+        cursor.executemany(
+            "UPDATE albums SET cover_path = ? WHERE folder_path = ?;", updates
+        )
+        commit()
+
+    # Newly indexed and previously cached covers together
+    results = execute_query(
+        cursor,
+        "SELECT cover_path FROM albums WHERE cover_path IS NOT NULL;",
+        fetch_all=True,
+    )
+    return results or []
+
+
+def get_cached_cover_album_ids(limit):
+    """Retrieve the ids of up to `limit` albums with a cover cached in the table."""
+    with open_cursor(row_factory=scalar_row) as cursor:
+        ensure_album_cover_columns(cursor)
+        results = execute_query(
+            cursor,
+            "SELECT album_id FROM albums WHERE cover_blob IS NOT NULL LIMIT ?;",
+            (limit,),
+            fetch_all=True,
+        )
+    return results or []
+
+
+def _get_resizer():
+    """Return the resizer of the current process, building it on first use."""
+    global _resizer
+    if _resizer is None:
+        _resizer = Resizer(ResizeAlg.convolution(FilterType.lanczos3))
+    return _resizer
+
+
+def _get_tile(tile_size):
+    """Return the destination tile of the current process, reused for every cover."""
+    global _tile
+    if _tile is None or _tile.size != (tile_size, tile_size):
+        _tile = Image.new("RGB", (tile_size, tile_size))
+    return _tile
+
+
+def _read_cover(cover_path):
+    """Read the raw bytes of a cover file, returning None on failure."""
+    try:
+        with open(cover_path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        logger.error(f"Error reading {cover_path}: {e}")
+        return None
+
+
+def _load_tile(index, cover_data, tile_size):
+    """Decode and resize a single cover, returning its raw RGB bytes."""
+    cover = Image.open(io.BytesIO(cover_data))
+    # Let libjpeg scale down during the IDCT, Lanczos only does the final fixup
+    cover.draft("RGB", (tile_size, tile_size))
+    cover = cover.convert("RGB")
+    _get_resizer().resize_pil(cover, _get_tile(tile_size))
+    return index, _tile.tobytes()
+
+
+def _load_tile_from_file(index, cover_path, tile_size):
+    """Read and decode a cover file in the worker, its bytes are never pickled."""
+    with open(cover_path, "rb") as f:
+        return _load_tile(index, f.read(), tile_size)
+
+
+def _get_worker_connection(db_path):
+    """Return the connection of the current worker process, opening it once."""
+    global _worker_conn
+    if _worker_conn is None:
+        _worker_conn = sqlite3.connect(db_path)
+    return _worker_conn
+
+
+def _load_tile_from_db(index, album_id, tile_size, db_path):
+    """Read and decode a cached cover in the worker, its bytes are never pickled."""
+    row = (
+        _get_worker_connection(db_path)
+        .execute("SELECT cover_blob FROM albums WHERE album_id = ?;", (album_id,))
+        .fetchone()
+    )
+    return _load_tile(index, row[0], tile_size)
+
+
 def create_mosaic(output_path="mosaic.jpg", tile_size=100, grid_size=(33, 33)):
     """Create a mosaic from album covers."""
-    covers = get_album_covers(perform_action=False)
+    tile_count = grid_size[0] * grid_size[1]
+    album_ids = get_cached_cover_album_ids(tile_count)
+
+    if album_ids:
+        covers = [f"cached cover of album {album_id}" for album_id in album_ids]
+    else:
+        # No covers cached yet, fall back to the cover files in the album folders
+        covers = get_album_covers(perform_action=False)[:tile_count]
 
     if not covers:
         print("No album covers found.")
@@ -153,21 +348,58 @@ def create_mosaic(output_path="mosaic.jpg", tile_size=100, grid_size=(33, 33)):
 
     mosaic_width = grid_size[0] * tile_size
     mosaic_height = grid_size[1] * tile_size
-    mosaic = Image.new("RGB", (mosaic_width, mosaic_height))
-
-    for index, cover_path in enumerate(covers):
-        if index >= grid_size[0] * grid_size[1]:
-            break  # Limit to grid size
+    # Black background for missing tiles, like Image.new
+    mosaic = np.zeros((mosaic_height, mosaic_width, 3), dtype=np.uint8)
 
-        try:
-            cover = Image.open(cover_path)
-            cover = cover.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+    def paste_tile(index, buffer):
+        x = (index % grid_size[0]) * tile_size
+        y = (index // grid_size[0]) * tile_size
+        mosaic[y : y + tile_size, x : x + tile_size] = np.frombuffer(
+            buffer, dtype=np.uint8
+        ).reshape(tile_size, tile_size, 3)
 
-            x = (index % grid_size[0]) * tile_size
-            y = (index // grid_size[0]) * tile_size
-            mosaic.paste(cover, (x, y))
-        except Exception as e:
-            logger.error(f"Error processing {cover_path}: {e}")
+    db_path = load_config()["database"]["path"]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {}
+        for index, cover_path in enumerate(covers):
+            if album_ids:
+                # Cached covers are read by the workers, only the album id is sent
+                future = executor.submit(
+                    _load_tile_from_db, index, album_ids[index], tile_size, db_path
+                )
+                futures[future] = cover_path
+                continue
+            if cover_path.startswith("\\\\"):
+                # Covers on network shares are read sequentially in this process
+                cover_data = _read_cover(cover_path)
+            else:
+                # Local covers are read by the workers, overlapping read and decode
+                future = executor.submit(
+                    _load_tile_from_file, index, cover_path, tile_size
+                )
+                futures[future] = cover_path
+                continue
+            if cover_data:
+                future = executor.submit(_load_tile, index, cover_data, tile_size)
+                futures[future] = cover_path
+        for future in as_completed(futures):
+            try:
+                paste_tile(*future.result())
+            except Exception as e:
+                logger.error(f"Error processing {futures[future]}: {e}")
 
-    mosaic.save(output_path)
+    if os.path.splitext(output_path)[1].lower() in (".jpg", ".jpeg"):
+        if not features.check_feature("libjpeg_turbo"):
+            logger.warning("Pillow is not built with libjpeg-turbo, encoding is slower")
+        Image.fromarray(mosaic).save(
+            output_path,
+            "JPEG",
+            quality=85,
+            subsampling=2,
+            progressive=True,
+            optimize=False,
+        )
+    else:
+        # Other targets keep the format Pillow infers from the extension
+        Image.fromarray(mosaic).save(output_path)
     logger.info(f"Mosaic saved to {output_path}")
@@ -26,12 +26,15 @@
     THE SOFTWARE.
 """
 
+import atexit
+import json
 import logging
 import os
 import sqlite3
 import subprocess
-import sys
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
 from application.utils.config_loader import load_config
@@ -41,29 +44,232 @@ conn = None
 # Load the configuration
 config = load_config()
 db_config = config["database"]
+translate_config = config["local_translate_audio_path"]
+_TRANSLATE_SOURCE = translate_config["source"]
+_TRANSLATE_TARGET = translate_config["target"]
+_TRANSLATE_ALBUM_FOLDER = "albums.folder_path" in translate_config["fields"]
 isconnected = False
 
 
+class InsertError(RuntimeError):
+    """Raised when an artist, album or track cannot be inserted."""
+
+
+# Stored in PRAGMA user_version once initialize_schema has run, version 2
+# added the secondary indexes, version 3 normalized the validity flags
+SCHEMA_VERSION = 3
+
+# Artist and album ids by MusicBrainz id, an album's tracks share the same ids
+_artist_ids = {}
+_album_ids = {}
+
+# SQL statements are kept as constants so sqlite3 reuses its cached statements.
+# The no-op DO UPDATE lets RETURNING report the id of an existing row without
+# rewriting its indexed MusicBrainz id.
+SQL_INSERT_TAG = "INSERT INTO tags (track_id, key, value) VALUES (?, ?, ?);"
+
+SQL_INSERT_ARTIST = """
+    INSERT INTO artists (name, musicbrainz_artist_id, is_musicbrainz_valid)
+    VALUES (?, ?, ?)
+    ON CONFLICT (musicbrainz_artist_id)
+    DO UPDATE SET is_musicbrainz_valid = is_musicbrainz_valid
+    RETURNING artist_id;
+"""
+
+SQL_INSERT_ALBUM = """
+    INSERT INTO albums (
+        name, artist_id, musicbrainz_album_id, barcode, release_date, is_musicbrainz_valid, folder_path
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (musicbrainz_album_id)
+    DO UPDATE SET is_musicbrainz_valid = is_musicbrainz_valid
+    RETURNING album_id;
+"""
+
+SQL_INSERT_TRACK = """
+    INSERT INTO tracks (
+        title, artist_id, album_id, genre, year, track_number, path, musicbrainz_release_track_id, is_musicbrainz_valid,length
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (musicbrainz_release_track_id)
+    DO UPDATE SET is_musicbrainz_valid = is_musicbrainz_valid
+    RETURNING track_id;
+"""
+
+# Multi-row VALUES template, DO NOTHING would skip RETURNING for existing
+# tracks so the conflict branch is a no-op update instead
+SQL_BULK_INSERT_TRACK = """
+    INSERT INTO tracks (
+        title, artist_id, album_id, genre, year, track_number, path, musicbrainz_release_track_id, is_musicbrainz_valid,length
+    )
+    VALUES {values}
+    ON CONFLICT (musicbrainz_release_track_id)
+    DO UPDATE SET is_musicbrainz_valid = is_musicbrainz_valid
+    RETURNING musicbrainz_release_track_id, track_id;
+"""
+# Rows per statement, keeps 10 parameters per row below SQLite's variable limit
+BULK_INSERT_ROWS = 500
+
+# Genre columns cannot be bound as parameters, the template is filled per genre
+SQL_TRACKS_BETWEEN_BY_GENRE = (
+    "SELECT track_id FROM track_features WHERE genre_{genre} BETWEEN ? AND ?;"
+)
+
+SQL_TRACK_BY_ID = """SELECT 
+        t.track_id AS track_id,
+        t.track_number AS track_number,
+        t.title AS track_title, 
+        t.length AS length,
+        a.name AS artist_name, 
+        al.name AS album_name,
+        t.year AS release_date,
+        t.path as title_path
+
+    FROM 
+        tracks t
+    JOIN 
+        artists a ON t.artist_id = a.artist_id
+    JOIN 
+        albums al ON t.album_id = al.album_id
+    WHERE 
+        t.track_id = ?;"""
+
+# Track rows joined with their album and artist, filled with a WHERE clause
+SQL_TRACKS_WITH_ALBUM = """SELECT
+        t.track_id,
+        CASE
+            WHEN t.track_number LIKE '%/%' THEN t.track_number
+            ELSE t.track_number || '/' || (SELECT COUNT(*) FROM tracks WHERE album_id = t.album_id)
+        END AS track_number_formatted,
+        t.title AS track_title,
+        t.length,
+        t.year AS track_release_date,
+        t.path,
+        a.album_id,
+        a.name AS album_title,
+        a.release_date AS album_release_date,
+        ar.artist_id,
+        ar.name AS artist_name
+    FROM
+        tracks t
+    JOIN
+        albums a ON t.album_id = a.album_id
+    JOIN
+        artists ar ON a.artist_id = ar.artist_id
+    WHERE
+        {where_sql}"""
+
+# Secondary indexes for the lookups done by the importer, updater and GUI
+SQL_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_tracks_album
+        ON tracks (album_id, track_number, title);
+    CREATE INDEX IF NOT EXISTS idx_track_features_track_id
+        ON track_features (track_id);
+    CREATE INDEX IF NOT EXISTS idx_albums_folder_path
+        ON albums (folder_path);
+    CREATE INDEX IF NOT EXISTS idx_tags_track_id
+        ON tags (track_id);
+"""
+
+# Secondary indexes of a table, the automatic UNIQUE indexes have no sql and
+# stay in place because the upserts rely on them
+SQL_SECONDARY_INDEXES = """
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL;
+"""
+
+# Tag lists are passed as one JSON array and expanded with json_each,
+# the templates are filled with the tag table and its key column
+SQL_DELETE_STALE_TAGS = """
+    DELETE FROM {table}
+    WHERE {key_column} = ? AND tag NOT IN (SELECT value FROM json_each(?));
+"""
+SQL_INSERT_TAGS = """
+    INSERT OR IGNORE INTO {table} ({key_column}, tag)
+    SELECT ?, value FROM json_each(?);
+"""
+
+SQL_ALBUM_FOLDER_BY_ID = "SELECT folder_path FROM albums WHERE album_id = ?;"
+
+
 def close_connection():
-    conn.close()
+    """Keep the shared connection open, it is reused for the process lifetime."""
 
 
-def cursor_factory():
-    conn = sqlite3.connect(db_config["path"])
-    conn.row_factory = sqlite3.Row
-    return conn.cursor()
+def _close_at_exit():
+    """Close the shared connection when the interpreter shuts down."""
+    global conn
+    if conn is not None:
+        conn.close()
+        conn = None
+
+
+@contextmanager
+def open_cursor(asrow=False, row_factory=None):
+    """Yield a cursor on the shared connection and close it afterwards."""
+    cursor = create_cursor(asrow, row_factory)
+    try:
+        yield cursor
+    finally:
+        cursor.close()
 
 
 # Establish Database Connection
-def get_connection(asrow=False):
+def get_connection():
+    """Return the shared connection, opening it on first use."""
     global conn
+    if conn is not None:
+        return conn
     try:
-        conn = sqlite3.connect(db_config["path"])
-        if asrow:
-            conn.row_factory = sqlite3.Row
+        # A larger statement cache keeps every hot insert/lookup statement prepared
+        conn = sqlite3.connect(
+            db_config["path"], check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-262144;")
+        # Map the database file so cover blobs are served from the page cache
+        conn.execute("PRAGMA mmap_size=268435456;")
+        atexit.register(_close_at_exit)
     except Exception as e:
         logger.error(f"Error connecting to database: {e}")
         raise
+    return conn
+
+
+def prepare_for_bulk_import():
+    """Trade crash durability for write speed while a bulk import runs."""
+    get_connection().execute("PRAGMA synchronous=OFF;")
+
+
+def finalize_bulk_import():
+    """Restore the regular durability settings after a bulk import."""
+    get_connection().execute("PRAGMA synchronous=NORMAL;")
+
+
+def ensure_indexes():
+    """Create the secondary indexes that are missing, the tables must exist."""
+    try:
+        conn.executescript(SQL_INDEXES)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Could not create indexes: {e}")
+
+
+def defer_indexes(cursor, table):
+    """Drop the secondary indexes of a table and return their definitions."""
+    cursor.execute(SQL_SECONDARY_INDEXES, (table,))
+    definitions = cursor.fetchall()
+    for name, _ in definitions:
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}";')
+    return [sql for _, sql in definitions]
+
+
+def restore_indexes(cursor, definitions):
+    """Recreate indexes dropped by defer_indexes, built once over the loaded rows."""
+    for sql in definitions:
+        cursor.execute(sql.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+    cursor.connection.commit()
 
 
 def commit():
@@ -72,24 +278,32 @@ def commit():
 
 
 def clean_tables():
-    global conn
+    conn = get_connection()
     cursor = conn.cursor()
 
-    # Enable foreign key constraints
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
     # Get all table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    cursor.execute("SELECT DISTINCT name FROM sqlite_master WHERE type='table';")
     tables = cursor.fetchall()
+    # Without foreign key checks SQLite can use its truncate optimization,
+    # the pragma has to be set outside of the transaction
+    conn.commit()
+    foreign_keys = cursor.execute("PRAGMA foreign_keys;").fetchone()[0]
     cursor.execute("PRAGMA foreign_keys = OFF;")
-    # Delete data from each table
-    for table in tables:
-        cursor.execute(f"DELETE FROM {table[0]};")
-        conn.commit()
+    try:
+        # Delete data from all tables in one transaction
+        with conn:
+            for table in tables:
+                cursor.execute(f"DELETE FROM {table[0]};")
+    finally:
+        # The connection is shared, restore the setting it had before
+        cursor.execute(f"PRAGMA foreign_keys = {foreign_keys};")
+        cursor.close()
+    clear_id_caches()
 
-    cursor.execute("PRAGMA foreign_keys = ON;")
 
-    conn.close()
+# Pages copied per backup step, one page per step made a backup take one
+# step and one progress log line for every 4 KiB of the database
+BACKUP_PAGES_PER_STEP = 4096
 
 
 def backup_database(output_dir="backups"):
@@ -108,14 +322,14 @@ def backup_database(output_dir="backups"):
 
         with backup_conn:
             # Perform the backup
-            conn.backup(backup_conn, pages=1, progress=print_progress)
+            get_connection().backup(
+                backup_conn, pages=BACKUP_PAGES_PER_STEP, progress=print_progress
+            )
         logger.info(f"Backup successful: {backup_file}")
     except sqlite3.Error as e:
         logger.ino(f"Error during backup: {e}")
     finally:
-        # Close the connections
-        if conn:
-            conn.close()
+        # Close the backup connection
         if backup_conn:
             backup_conn.close()
 
@@ -127,239 +341,298 @@ def print_progress(status, remaining, total):
 
 def restore_database(backup_file):
     """Restore the database using pg_restore."""
-    global conn
+    conn = get_connection()
     try:
         # Connect to the backup database
         backup_conn = sqlite3.connect(backup_file)
 
-        with conn:
-            # Perform the backup
-            backup_conn.backup(conn, pages=1, progress=print_progress)
+        # The restore can be repeated from the backup, skip the fsyncs meanwhile
+        conn.execute("PRAGMA synchronous=OFF;")
+        try:
+            with conn:
+                # Perform the backup
+                backup_conn.backup(
+                    conn, pages=BACKUP_PAGES_PER_STEP, progress=print_progress
+                )
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL;")
+        clear_id_caches()
         logger.info(f"Restore successful: {backup_file}")
     except sqlite3.Error as e:
         logger.ino(f"Error during backup: {e}")
     finally:
-        # Close the connections
-        if conn:
-            conn.close()
+        # Close the backup connection
         if backup_conn:
             backup_conn.close()
 
 
-# Initialize Database Schema
-def initialize_schema():
-    global conn
-    schema_sql = """
-        CREATE TABLE album_tags (
-            album_id integer NOT NULL,
-            tag text NOT NULL,
-            PRIMARY KEY (album_id, tag),
-            FOREIGN KEY (album_id) REFERENCES albums(album_id) ON DELETE CASCADE
-        );
-
-        --
-        -- Name: albums; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE albums (
-            album_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name character varying(500) NOT NULL,
-            artist_id integer,
-            barcode character varying(20),
-            musicbrainz_id uuid,
-            release_date date,
-            created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
-            musicbrainz_album_id uuid UNIQUE NOT NULL,
-            is_musicbrainz_valid boolean DEFAULT true,
-            primary_type text,
-            secondary_types text[],
-            tags text[],
-            folder_path text,
-            FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
-        );
-
-        CREATE TABLE artist_relationships (
-            artist_id integer NOT NULL,
-            related_artist_id integer NOT NULL,
-            relationship_type text NOT NULL,
-            PRIMARY KEY (artist_id, related_artist_id, relationship_type),
-            FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE,
-            FOREIGN KEY (related_artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
-        );
-
-
-        --
-        -- Name: artist_tags; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE artist_tags (
-            artist_id integer NOT NULL,
-            tag text NOT NULL,
-            PRIMARY KEY (artist_id, tag),
-            FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
-        );
-
-
-        --
-        -- Name: artists; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE artists (
-            artist_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name character varying(500) NOT NULL,
-            musicbrainz_id uuid,
-            created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
-            musicbrainz_artist_id uuid UNIQUE NOT NULL,
-            is_musicbrainz_valid boolean DEFAULT true,
-            sort_name text,
-            type text,
-            begin_area text,
-            life_span_start date,
-            life_span_ended boolean,
-            aliases text[],
-            life_span_end date,
-            wikidata_id character varying(255)
-        );
-
-        --
-        -- Name: tags; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE tags (
-            tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            track_id integer,
-            key character varying(100) NOT NULL,
-            value text NOT NULL,
-            FOREIGN KEY (track_id) REFERENCES tracks(track_id)
-        );
-
-        --
-        -- Name: track_features; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE track_features (
-            feature_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            track_id integer NOT NULL,
-            danceability real,
-            female real,
-            male real,
-            genre_alternative real,
-            genre_blues real,
-            genre_electronic real,
-            genre_folkcountry real,
-            genre_funksoulrnb real,
-            genre_jazz real,
-            genre_pop real,
-            genre_raphiphop real,
-            genre_rock real,
-            genre_electronic_ambient real,
-            genre_electronic_dnb real,
-            genre_electronic_house real,
-            genre_electronic_techno real,
-            genre_electronic_trance real,
-            genre_rosamerica_cla real,
-            genre_rosamerica_dan real,
-            genre_rosamerica_hip real,
-            genre_rosamerica_jaz real,
-            genre_rosamerica_pop real,
-            genre_rosamerica_rhy real,
-            genre_rosamerica_roc real,
-            genre_rosamerica_spe real,
-            genre_tzanetakis_blu real,
-            genre_tzanetakis real,
-            genre_tzanetakis_cou real,
-            genre_tzanetakis_dis real,
-            genre_tzanetakis_hip real,
-            genre_tzanetakis_jaz real,
-            genre_tzanetakis_met real,
-            genre_tzanetakis_pop real,
-            genre_tzanetakis_reg real,
-            genre_tzanetakis_roc real,
-            ismir04_rhythm_chachacha real,
-            ismir04_rhythm_jive real,
-            ismir04_rhythm_quickstep real,
-            ismir04_rhythm_rumba_american real,
-            ismir04_rhythm_rumba_international real,
-            ismir04_rhythm_rumba_misc real,
-            ismir04_rhythm_samba real,
-            ismir04_rhythm_tango real,
-            ismir04_rhythm_viennesewaltz real,
-            ismir04_rhythm_waltz real,
-            mood_acoustic real,
-            mood_electronic real,
-            mood_happy real,
-            mood_party real,
-            mood_relaxed real,
-            mood_sad real,
-            moods_mirex real,
-            timbre real,
-            tonal_atonal real,
-            voice_instrumental real,
-            average_loudness real,
-            dynamic_complexity real,
-            bpm real,
-            chords_key character varying(10),
-            chords_number_rate real,
-            chords_scale character varying(10),
-            danceability_low real,
-            FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
-        );
-
-
-
-        --
-        -- Name: track_tags; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE track_tags (
-            track_id integer NOT NULL,
-            tag text NOT NULL,
-            PRIMARY KEY (track_id, tag),
-            FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
-        );
-
-
-        --
-        -- Name: tracks; Type: TABLE; Schema: public; Owner: postgres
-        --
-
-        CREATE TABLE tracks (
-            track_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title character varying(500) NOT NULL,
-            artist_id integer,
-            album_id integer,
-            genre character varying(100),
-            year date,
-            track_number character varying(10),
-            path text NOT NULL,
-            created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
-            musicbrainz_release_track_id uuid UNIQUE,
-            is_musicbrainz_valid boolean DEFAULT true,
-            length text DEFAULT 'Unknown',
-            recording_id uuid UNIQUE,
-            tags text[],
-            FOREIGN KEY (album_id) REFERENCES albums(album_id),
-            FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
-        );
+def migrate_database(target_path):
+    """Copy the database straight into a new file, without an intermediate backup."""
+    try:
+        # One pass, writes a compacted copy that is ready to be opened
+        get_connection().execute("VACUUM INTO ?;", (target_path,))
+        logger.info(f"Migration successful: {target_path}")
+    except sqlite3.Error as e:
+        logger.error(f"Error during migration: {e}")
+
+
+SQL_TABLES = """
+    CREATE TABLE IF NOT EXISTS album_tags (
+        album_id integer NOT NULL,
+        tag text NOT NULL,
+        PRIMARY KEY (album_id, tag),
+        FOREIGN KEY (album_id) REFERENCES albums(album_id) ON DELETE CASCADE
+    );
+
+    --
+    -- Name: albums; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS albums (
+        album_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name character varying(500) NOT NULL,
+        artist_id integer,
+        barcode character varying(20),
+        musicbrainz_id uuid,
+        release_date date,
+        created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+        musicbrainz_album_id uuid UNIQUE NOT NULL,
+        is_musicbrainz_valid boolean DEFAULT true,
+        primary_type text,
+        secondary_types text[],
+        tags text[],
+        folder_path text,
+        cover_blob BLOB,
+        cover_path TEXT,
+        FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS artist_relationships (
+        artist_id integer NOT NULL,
+        related_artist_id integer NOT NULL,
+        relationship_type text NOT NULL,
+        PRIMARY KEY (artist_id, related_artist_id, relationship_type),
+        FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE,
+        FOREIGN KEY (related_artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
+    );
+
+
+    --
+    -- Name: artist_tags; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS artist_tags (
+        artist_id integer NOT NULL,
+        tag text NOT NULL,
+        PRIMARY KEY (artist_id, tag),
+        FOREIGN KEY (artist_id) REFERENCES artists(artist_id) ON DELETE CASCADE
+    );
+
+
+    --
+    -- Name: artists; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS artists (
+        artist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name character varying(500) NOT NULL,
+        musicbrainz_id uuid,
+        created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+        musicbrainz_artist_id uuid UNIQUE NOT NULL,
+        is_musicbrainz_valid boolean DEFAULT true,
+        sort_name text,
+        type text,
+        begin_area text,
+        life_span_start date,
+        life_span_ended boolean,
+        aliases text[],
+        life_span_end date,
+        wikidata_id character varying(255)
+    );
+
+    --
+    -- Name: tags; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS tags (
+        tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        track_id integer,
+        key character varying(100) NOT NULL,
+        value text NOT NULL,
+        FOREIGN KEY (track_id) REFERENCES tracks(track_id)
+    );
+
+    --
+    -- Name: track_features; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS track_features (
+        feature_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        track_id integer NOT NULL,
+        danceability real,
+        female real,
+        male real,
+        genre_alternative real,
+        genre_blues real,
+        genre_electronic real,
+        genre_folkcountry real,
+        genre_funksoulrnb real,
+        genre_jazz real,
+        genre_pop real,
+        genre_raphiphop real,
+        genre_rock real,
+        genre_electronic_ambient real,
+        genre_electronic_dnb real,
+        genre_electronic_house real,
+        genre_electronic_techno real,
+        genre_electronic_trance real,
+        genre_rosamerica_cla real,
+        genre_rosamerica_dan real,
+        genre_rosamerica_hip real,
+        genre_rosamerica_jaz real,
+        genre_rosamerica_pop real,
+        genre_rosamerica_rhy real,
+        genre_rosamerica_roc real,
+        genre_rosamerica_spe real,
+        genre_tzanetakis_blu real,
+        genre_tzanetakis real,
+        genre_tzanetakis_cou real,
+        genre_tzanetakis_dis real,
+        genre_tzanetakis_hip real,
+        genre_tzanetakis_jaz real,
+        genre_tzanetakis_met real,
+        genre_tzanetakis_pop real,
+        genre_tzanetakis_reg real,
+        genre_tzanetakis_roc real,
+        ismir04_rhythm_chachacha real,
+        ismir04_rhythm_jive real,
+        ismir04_rhythm_quickstep real,
+        ismir04_rhythm_rumba_american real,
+        ismir04_rhythm_rumba_international real,
+        ismir04_rhythm_rumba_misc real,
+        ismir04_rhythm_samba real,
+        ismir04_rhythm_tango real,
+        ismir04_rhythm_viennesewaltz real,
+        ismir04_rhythm_waltz real,
+        mood_acoustic real,
+        mood_electronic real,
+        mood_happy real,
+        mood_party real,
+        mood_relaxed real,
+        mood_sad real,
+        moods_mirex real,
+        timbre real,
+        tonal_atonal real,
+        voice_instrumental real,
+        average_loudness real,
+        dynamic_complexity real,
+        bpm real,
+        chords_key character varying(10),
+        chords_number_rate real,
+        chords_scale character varying(10),
+        danceability_low real,
+        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+    );
+
+
+
+    --
+    -- Name: track_tags; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS track_tags (
+        track_id integer NOT NULL,
+        tag text NOT NULL,
+        PRIMARY KEY (track_id, tag),
+        FOREIGN KEY (track_id) REFERENCES tracks(track_id) ON DELETE CASCADE
+    );
+
+
+    --
+    -- Name: tracks; Type: TABLE; Schema: public; Owner: postgres
+    --
+
+    CREATE TABLE IF NOT EXISTS tracks (
+        track_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title character varying(500) NOT NULL,
+        artist_id integer,
+        album_id integer,
+        genre character varying(100),
+        year date,
+        track_number character varying(10),
+        path text NOT NULL,
+        created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+        musicbrainz_release_track_id uuid UNIQUE,
+        is_musicbrainz_valid boolean DEFAULT true,
+        length text DEFAULT 'Unknown',
+        recording_id uuid UNIQUE,
+        tags text[],
+        FOREIGN KEY (album_id) REFERENCES albums(album_id),
+        FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
+    );
+"""
 
+# Converts 'TRUE'/'FALSE' text written by older imports to 1/0, the validity
+# filters compare against numbers
+SQL_NORMALIZE_VALID_FLAGS = "".join(
+    f"""
+    UPDATE {table}
+    SET is_musicbrainz_valid = (is_musicbrainz_valid = 'TRUE')
+    WHERE is_musicbrainz_valid IN ('TRUE', 'FALSE');
+"""
+    for table in ("artists", "albums", "tracks")
+)
 
-    """
+
+# Initialize Database Schema
+def initialize_schema():
+    conn = get_connection()
+    # Warm start, the schema of this version is already in place
+    if conn.execute("PRAGMA user_version;").fetchone()[0] >= SCHEMA_VERSION:
+        return
     cursor = conn.cursor()
     try:
-        cursor.execute(schema_sql)
-        conn.commit()
+        # Tables and data migrations in one transaction, a failed run leaves
+        # user_version untouched
+        cursor.executescript(
+            f"BEGIN; {SQL_TABLES} {SQL_NORMALIZE_VALID_FLAGS} "
+            f"PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;"
+        )
         logger.info("Database schema initialized successfully.")
     except Exception as e:
-        conn.rollback()
+        if conn.in_transaction:
+            conn.rollback()
         logger.error(f"Error initializing schema: {e}")
+        return
     finally:
         cursor.close()
+    # Indexes are built once the tables are committed
+    ensure_indexes()
 
 
-def create_cursor(asrow=False):
-    global conn
-    get_connection(asrow)
-    cursor = conn.cursor()
+def ensure_album_cover_columns(cursor):
+    """Add the cover columns to albums for databases created without them."""
+    # Own cursor, the caller's cursor may use a different row factory
+    columns = {
+        row[1] for row in cursor.connection.execute("PRAGMA table_info(albums);")
+    }
+    if "cover_blob" not in columns:
+        cursor.execute("ALTER TABLE albums ADD COLUMN cover_blob BLOB;")
+    if "cover_path" not in columns:
+        cursor.execute("ALTER TABLE albums ADD COLUMN cover_path TEXT;")
+
+
+def scalar_row(cursor, row):
+    """Row factory returning the first column instead of a 1-tuple."""
+    return row[0]
+
+
+def create_cursor(asrow=False, row_factory=None):
+    cursor = get_connection().cursor()
+    if asrow:
+        cursor.row_factory = sqlite3.Row
+    elif row_factory is not None:
+        cursor.row_factory = row_factory
     return cursor
 
 
@@ -369,49 +642,41 @@ def close_cursor(cursor):
 
 # Example: Insert custom tag
 def insert_tag(cursor, track_id, key, value):
-    global conn
+    insert_tags_bulk(cursor, [(track_id, key, value)])
+
+
+def insert_tags_bulk(cursor, rows):
+    """Insert (track_id, key, value) rows, any iterable, in one executemany call."""
     try:
-        cursor.execute(
-            f"INSERT INTO tags (track_id, key, value) VALUES (?, ?, ?);",
-            (track_id, key, value),
-        )
+        cursor.executemany(SQL_INSERT_TAG, rows)
     except Exception as e:
-        conn.rollback()
-        logger.error(f"Failed to insert tag: {e}")
+        # No rollback here, it would discard the caller's whole open batch
+        logger.error(f"Failed to insert tags: {e}")
 
 
-def insert_artist(cursor, name, musicbrainz_artist_id, is_musicbrainz_valid):
+def clear_id_caches():
+    """Forget cached artist/album ids, needed after deletes or a rollback."""
+    _artist_ids.clear()
+    _album_ids.clear()
 
-    if is_musicbrainz_valid:
-        db_valid = "TRUE"
-    else:
-        db_valid = "FALSE"
 
-    try:
-        # Step 1: Insert if not exists
-        cursor.execute(
-            """
-            INSERT OR IGNORE INTO artists (name, musicbrainz_artist_id, is_musicbrainz_valid)
-            VALUES (?, ?, ?);
-            """,
-            (name, musicbrainz_artist_id, db_valid),
-        )
+def insert_artist(cursor, name, musicbrainz_artist_id, is_musicbrainz_valid):
+    if musicbrainz_artist_id in _artist_ids:
+        return _artist_ids[musicbrainz_artist_id]
 
-        # Step 2: Retrieve the artist_id
+    try:
+        # Insert if not exists and return the artist_id in the same statement
         cursor.execute(
-            """
-            SELECT artist_id
-            FROM artists
-            WHERE musicbrainz_artist_id = ?;
-            """,
-            (musicbrainz_artist_id,),
+            SQL_INSERT_ARTIST,
+            (name, musicbrainz_artist_id, is_musicbrainz_valid),
         )
 
         artist_id = cursor.fetchone()[0]
+        _artist_ids[musicbrainz_artist_id] = artist_id
         return artist_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Failed to insert artist: {e}")
+        raise InsertError("Failed to insert artist") from e
 
 
 # Example: Insert album
@@ -425,123 +690,73 @@ def insert_album(
     is_musicbrainz_valid=True,
     folder=None,
 ):
-    global conn
-
-    if is_musicbrainz_valid:
-        db_valid = "TRUE"
-    else:
-        db_valid = "FALSE"
+    if musicbrainz_album_id in _album_ids:
+        return _album_ids[musicbrainz_album_id]
 
     try:
-        # Step 1: Insert or ignore
+        # Insert if not exists and return the album_id in the same statement
         cursor.execute(
-            """
-            INSERT OR IGNORE INTO albums (
-                name, artist_id, musicbrainz_album_id, barcode, release_date, is_musicbrainz_valid, folder_path
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?);
-            """,
+            SQL_INSERT_ALBUM,
             (
                 name,
                 artist_id,
                 musicbrainz_album_id,
                 barcode,
                 release_date,
-                db_valid,
+                is_musicbrainz_valid,
                 folder,
             ),
         )
 
-        # Step 2: Retrieve the album_id
-        cursor.execute(
-            """
-            SELECT album_id
-            FROM albums
-            WHERE musicbrainz_album_id = ?;
-            """,
-            (musicbrainz_album_id,),
-        )
-
         result = cursor.fetchone()
+        if result:
+            _album_ids[musicbrainz_album_id] = result[0]
         return result[0] if result else None  # Return album_id
     except Exception as e:
-        conn.rollback()
         logger.error(f"Failed to insert album: {e}")
-        sys.exit(1)
+        raise InsertError("Failed to insert album") from e
 
 
 def get_tracks_between_by_genre(cursor, genre, lower_bound, upper_bound):
-    query = f"SELECT track_id FROM track_features WHERE genre_{genre} BETWEEN ? AND ?;"
-
-    cursor.execute(query, (lower_bound, upper_bound))
-
-    tracks_in_range = cursor.fetchall()
+    query = SQL_TRACKS_BETWEEN_BY_GENRE.format(genre=genre)
 
-    return [row[0] for row in tracks_in_range]
-
-
-def get_track_by_id(cursor, track_id):
-    SQL_QUERY = """SELECT 
-            t.track_id AS track_id,
-            t.track_number AS track_number,
-            t.title AS track_title, 
-            t.length AS length,
-            a.name AS artist_name, 
-            al.name AS album_name,
-            t.year AS release_date,
-            t.path as title_path
+    # Separate cursor so the caller's cursor keeps returning plain tuples
+    scalar_cursor = cursor.connection.cursor()
+    scalar_cursor.row_factory = scalar_row
+    try:
+        return scalar_cursor.execute(query, (lower_bound, upper_bound)).fetchall()
+    finally:
+        scalar_cursor.close()
 
-        FROM 
-            tracks t
-        JOIN 
-            artists a ON t.artist_id = a.artist_id
-        JOIN 
-            albums al ON t.album_id = al.album_id
-        WHERE 
-            t.track_id = ?;"""
 
-    cursor.execute(
-        SQL_QUERY,
-        (track_id,),
+def get_track_by_id(cursor, track_id, as_dict=False):
+    return execute_query(
+        cursor, SQL_TRACK_BY_ID, (track_id,), fetch_one=True, as_dict=as_dict
     )
 
-    result = cursor.fetchone()
-    return result
-
 
 def get_cover_by_album_id(cursor, album_id):
-    SQL_QUERY = """SELECT 
-            folder_path 
-        FROM 
-            albums 
-        where
-        album_id = ?;"""
     cursor.execute(
-        SQL_QUERY,
+        SQL_ALBUM_FOLDER_BY_ID,
         (album_id,),
     )
     result = cursor.fetchone()
 
     folder = result[0]
 
-    config = load_config()
-    translate_config = config["local_translate_audio_path"]
-
-    if "albums.folder_path" in translate_config["fields"]:
-        folder = (
-            folder.replace(translate_config["source"], translate_config["target"], 1)
-            if folder.startswith(translate_config["source"])
-            else folder
-        )
+    if _TRANSLATE_ALBUM_FOLDER and folder.startswith(_TRANSLATE_SOURCE):
+        folder = folder.replace(_TRANSLATE_SOURCE, _TRANSLATE_TARGET, 1)
 
-    cover_path = Path(folder) / "cover.jpg"
+    # normcase keeps the case-insensitive match of Path.exists on Windows
+    try:
+        with os.scandir(folder) as entries:
+            paths = {os.path.normcase(entry.name): entry.path for entry in entries}
+    except OSError:
+        return None
 
-    if cover_path.exists():
-        return cover_path
-    else:
-        cover_path = Path(folder) / "cover.png"
-    if cover_path.exists():
-        return cover_path
+    for name in ("cover.jpg", "cover.png"):
+        if name in paths:
+            return Path(paths[name])
 
     return None
 
@@ -560,21 +775,10 @@ def insert_track(
     is_musicbrainz_valid,
     length="0:00",
 ):
-    global conn
-    if is_musicbrainz_valid:
-        db_valid = "TRUE"
-    else:
-        db_valid = "FALSE"
-
     try:
-        # Step 1: Insert or ignore
+        # Insert if not exists and return the track_id in the same statement
         cursor.execute(
-            """
-            INSERT OR IGNORE INTO tracks (
-                title, artist_id, album_id, genre, year, track_number, path, musicbrainz_release_track_id, is_musicbrainz_valid,length
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
+            SQL_INSERT_TRACK,
             (
                 title,
                 artist_id,
@@ -584,47 +788,62 @@ def insert_track(
                 track_number,
                 path,
                 musicbrainz_release_track_id,
-                db_valid,
+                is_musicbrainz_valid,
                 length,
             ),
         )
 
-        # Step 2: Retrieve track_id
-        cursor.execute(
-            """
-            SELECT track_id
-            FROM tracks
-            WHERE musicbrainz_release_track_id = ?;
-            """,
-            (musicbrainz_release_track_id,),
-        )
-
         result = cursor.fetchone()
         return result[0] if result else None
     except Exception as e:
-        conn.rollback()
         logger.error(f"Failed to insert track: {e}")
+        raise InsertError("Failed to insert track") from e
 
 
-def execute_query_print_out(sql_query, params):
-    global conn
-    cursor = conn.cursor()
+def bulk_insert_tracks(cursor, rows):
+    """
+    Insert many tracks at once from any iterable, rows follow the column order
+    of insert_track.
+    Returns a dict of track_id by musicbrainz_release_track_id, including
+    tracks that already existed.
+    """
+    track_ids = {}
+    rows = iter(rows)
     try:
-        cursor.execute(sql_query, params)
-        results = cursor.fetchall()
-        for row in results:
-            print(
-                f"Title: {row[0]}, Artist: {row[1]}, Album: {row[2]}, Genre: {row[3]}"
+        # Rows may come from a generator, only one chunk is held in memory
+        while chunk := list(islice(rows, BULK_INSERT_ROWS)):
+            values = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(chunk))
+            cursor.execute(
+                SQL_BULK_INSERT_TRACK.format(values=values),
+                [value for row in chunk for value in row],
             )
+            # RETURNING order is not guaranteed, map the ids by MusicBrainz id
+            track_ids.update(cursor.fetchall())
     except Exception as e:
-        logger.error(f"Error executing query: {sql_query} {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        logger.error(f"Failed to bulk insert tracks: {e}")
+        raise InsertError("Failed to bulk insert tracks") from e
+    return track_ids
 
 
-def execute_query(cursor, query, params="", fetch_one=False, fetch_all=False):
-    global conn
+def execute_query_print_out(sql_query, params):
+    with open_cursor() as cursor:
+        try:
+            # Iterate the cursor so rows are stepped one at a time, not materialized
+            for row in cursor.execute(sql_query, params):
+                print(
+                    f"Title: {row[0]}, Artist: {row[1]}, Album: {row[2]}, Genre: {row[3]}"
+                )
+        except Exception as e:
+            logger.error(f"Error executing query: {sql_query} {e}")
+
+
+def execute_query(
+    cursor, query, params="", fetch_one=False, fetch_all=False, as_dict=False
+):
+    if as_dict:
+        # Rows with column-name access, only for callers that need it
+        cursor = cursor.connection.cursor()
+        cursor.row_factory = sqlite3.Row
     try:
         cursor.execute(query, params)
         if fetch_one:
@@ -635,37 +854,34 @@ def execute_query(cursor, query, params="", fetch_one=False, fetch_all=False):
             result = None
         return result
     except Exception as e:
-        conn.rollback()
         print(f"Error executing query: {query} {e}")
         return None
+    finally:
+        if as_dict:
+            cursor.close()
+
+
+def replace_tags(cursor, table, key_column, key, tags):
+    """Make the tags stored for `key` in a tag table equal to `tags`."""
+    tags_json = json.dumps(list(tags))
+    # Only remove tags that are gone and add the new ones
+    cursor.execute(
+        SQL_DELETE_STALE_TAGS.format(table=table, key_column=key_column),
+        (key, tags_json),
+    )
+    cursor.execute(
+        SQL_INSERT_TAGS.format(table=table, key_column=key_column), (key, tags_json)
+    )
 
 
 def update_album_tags(cursor, album_id, tags):
-    """Update tags for an album."""
-    # Remove existing tags for the album
-    execute_query(cursor, "DELETE FROM album_tags WHERE album_id = ?;", (album_id,))
-
-    # Insert new tags
-    for tag in tags:
-        execute_query(
-            cursor,
-            "INSERT INTO album_tags (album_id, tag) VALUES (?, ?) ON CONFLICT DO NOTHING;",
-            (album_id, tag),
-        )
+    """Update tags for an album, committed with the caller's transaction."""
+    replace_tags(cursor, "album_tags", "album_id", album_id, tags)
 
 
 def update_track_tags(cursor, track_id, tags):
-    """Update tags for a track."""
-    # Remove existing tags for the track
-    execute_query(cursor, "DELETE FROM track_tags WHERE track_id = ?;", (track_id,))
-
-    # Insert new tags
-    for tag in tags:
-        execute_query(
-            cursor,
-            "INSERT INTO track_tags (track_id, tag) VALUES (?, ?) ON CONFLICT DO NOTHING;",
-            (track_id, tag),
-        )
+    """Update tags for a track, committed with the caller's transaction."""
+    replace_tags(cursor, "track_tags", "track_id", track_id, tags)
 
 
 def get_tracks_by_id(cursor, id, type):
@@ -678,29 +894,7 @@ def get_tracks_by_id(cursor, id, type):
         where_sql = "t.track_id = ?;"
     else:
         return
-    sql_query = f"""SELECT
-        t.track_id,
-        CASE
-            WHEN t.track_number LIKE '%/%' THEN t.track_number
-            ELSE t.track_number || '/' || (SELECT COUNT(*) FROM tracks WHERE album_id = t.album_id)
-        END AS track_number_formatted,
-        t.title AS track_title,
-        t.length,
-        t.year AS track_release_date,
-        t.path,
-        a.album_id,
-        a.name AS album_title,
-        a.release_date AS album_release_date,
-        ar.artist_id,
-        ar.name AS artist_name
-    FROM
-        tracks t
-    JOIN
-        albums a ON t.album_id = a.album_id
-    JOIN
-        artists ar ON a.artist_id = ar.artist_id
-    WHERE
-        {where_sql}"""
+    sql_query = SQL_TRACKS_WITH_ALBUM.format(where_sql=where_sql)
 
     tracks = execute_query(
         cursor,
@@ -710,3 +904,20 @@ def get_tracks_by_id(cursor, id, type):
         fetch_all=True,
     )
     return tracks
+
+
+def get_tracks_by_ids(cursor, track_ids):
+    """Return the rows of get_tracks_by_id for many tracks, in the given order."""
+    sql_query = SQL_TRACKS_WITH_ALBUM.format(
+        where_sql="t.track_id IN (SELECT value FROM json_each(?));"
+    )
+    track_ids = [int(track_id) for track_id in track_ids]
+    tracks = execute_query(
+        cursor,
+        sql_query.replace("\n", ""),
+        (json.dumps(track_ids),),
+        fetch_one=False,
+        fetch_all=True,
+    )
+    by_id = {track[0]: track for track in tracks}
+    return [by_id[track_id] for track_id in track_ids if track_id in by_id]
@@ -31,6 +31,10 @@ import sqlite3
 # Connect to the database
 database_path = "../database/paula.sqlite"
 connection = sqlite3.connect(database_path)
+connection.execute("PRAGMA journal_mode=WAL;")
+connection.execute("PRAGMA synchronous=NORMAL;")
+connection.execute("PRAGMA cache_size=-65536;")
+connection.execute("PRAGMA temp_store=MEMORY;")
 cursor = connection.cursor()
 import numpy as np
 
@@ -58,6 +62,13 @@ def check_table(table_name):
         );
         """
         )
+    # Distributions are read per feature in insertion order
+    cursor.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_feature_distribution_name
+    ON feature_distribution (feature_name, id);
+    """
+    )
 
 
 table_name = "feature_distribution"
@@ -139,10 +150,17 @@ features = [
 filtered_features = []
 feature_min_max = {}
 
-for feature in features:
-    query = f"SELECT MIN({feature}), MAX({feature}) FROM track_features;"
-    cursor.execute(query)
-    feature_min, feature_max = cursor.fetchone()
+# Minimum and maximum of every feature in one scan of track_features
+cursor.execute(
+    "SELECT "
+    + ", ".join(f"MIN({feature}), MAX({feature})" for feature in features)
+    + " FROM track_features;"
+)
+min_max_row = cursor.fetchone()
+
+for feature, feature_min, feature_max in zip(
+    features, min_max_row[::2], min_max_row[1::2]
+):
     if feature_min and feature_max:
         if isinstance(feature_min, (int, float)) and not isinstance(feature_min, str):
             if isinstance(feature_max, (int, float)) and not isinstance(
@@ -154,40 +172,38 @@ for feature in features:
 
 # Number of intervals
 interval_count = 100
-interval_size = 1 / interval_count
 distributions = {}
 
-for feature in filtered_features:
-    feature_min, feature_max = feature_min_max[feature]
-    results = []
+# Load all numeric features once, NULL becomes NaN
+cursor.execute(f"SELECT {', '.join(filtered_features)} FROM track_features;")
+feature_matrix = np.array(cursor.fetchall(), dtype=np.float64).reshape(
+    -1, len(filtered_features)
+)
 
-    for i in range(interval_count):
-        lower_bound = i * interval_size
-        upper_bound = lower_bound + interval_size
+for column, feature in enumerate(filtered_features):
+    feature_min, feature_max = feature_min_max[feature]
 
-        # Convert normalized bounds to original scale
-        original_lower = lower_bound * (feature_max - feature_min) + feature_min
-        original_upper = upper_bound * (feature_max - feature_min) + feature_min
+    # Interval edges in the original scale, computed once per feature
+    edges = np.linspace(feature_min, feature_max, interval_count + 1)
 
-        # Query to count normalized values
-        query = f"""
-        SELECT COUNT(*)
-        FROM track_features
-        WHERE {feature} >= ? AND {feature} < ?;
-        """
-        cursor.execute(query, (original_lower, original_upper))
-        count = cursor.fetchone()[0]
+    # Intervals are half-open, the maximum itself is not counted; NaN is dropped
+    values = feature_matrix[:, column]
+    counts, _ = np.histogram(values[values < feature_max], bins=edges)
 
-        results.append(count)
+    results = counts.tolist()
+    distribution_rows = [
+        (feature, float(lower), float(upper), count)
+        for lower, upper, count in zip(edges[:-1], edges[1:], results)
+    ]
 
-        # Insert the distribution into the table
-        cursor.execute(
-            """
-        INSERT INTO feature_distribution (feature_name, range_start, range_end, count)
-        VALUES (?, ?, ?, ?);
-        """,
-            (feature, original_lower, original_upper, count),
-        )
+    # Insert the distribution of the feature into the table in one call
+    cursor.executemany(
+        """
+    INSERT INTO feature_distribution (feature_name, range_start, range_end, count)
+    VALUES (?, ?, ?, ?);
+    """,
+        distribution_rows,
+    )
 
 # Commit the changes and close the connection
 connection.commit()
@@ -28,13 +28,15 @@
 
 import random
 import sqlite3
+from collections import defaultdict
+from contextlib import closing
 from statistics import mean
 
-from application.textual.app import App, ComposeResult, RenderResult
-from application.textual.containers import Container, Horizontal, Vertical
-from application.textual.widget import Widget
-from application.textual.widgets import Label, OptionList, Sparkline, Static
-from application.textual.widgets.option_list import Option
+from textual.app import App, ComposeResult, RenderResult
+from textual.containers import Container, Horizontal, Vertical
+from textual.widget import Widget
+from textual.widgets import Label, OptionList, Sparkline, Static
+from textual.widgets.option_list import Option
 
 features = [
     "danceability",
@@ -108,32 +110,28 @@ features = [
     "mood_mirex_cluster5",
 ]
 
-# Connect to the database
 database_path = "../database/paula.sqlite"
-connection = sqlite3.connect(database_path)
-cursor = connection.cursor()
 
 
-def distribution_of_feature(feature):
-    sql = "SELECT count FROM feature_distribution WHERE feature_name = ?;"
-    cursor.execute(
-        sql,
-        (feature,),
-    )
-    results = cursor.fetchall()
-
-    return [tup[0] for tup in results]
+def load_distributions():
+    """Fetch the distributions of all features in one query, grouped by feature."""
+    sql = "SELECT feature_name, count FROM feature_distribution ORDER BY feature_name, id;"
+    distributions = defaultdict(list)
+    # Connect only while loading, importing the module does not open the database
+    with closing(sqlite3.connect(database_path)) as connection:
+        for feature, count in connection.execute(sql):
+            distributions[feature].append(count)
+    return distributions
 
 
 class SparklineSummaryFunctionApp(App[None]):
     CSS_PATH = "features_gui.tcss"
 
     def compose(self) -> ComposeResult:
+        distributions = load_distributions()
         for feature in features:
-            data = distribution_of_feature(feature)
             yield Label(feature)
-            yield Sparkline(data=data, summary_function=max)
-        connection.close()
+            yield Sparkline(data=distributions[feature], summary_function=max)
 
 
 app = SparklineSummaryFunctionApp()
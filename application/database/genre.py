@@ -26,37 +26,67 @@
     THE SOFTWARE.
 """
 
-import json
-import re
+import os
 from collections import Counter, defaultdict
 
-from application.database.database_helper import create_cursor, execute_query
+from application.database.database_helper import (
+    close_cursor,
+    create_cursor,
+    execute_query,
+    scalar_row,
+)
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder
+    orjson = None
+    import json
+
+# Both delimiters are folded onto ';' so a plain str.split is enough
+_GENRE_DELIMITERS = str.maketrans("/", ";")
+
+
+def dump_genre_tree(genre_tree, path):
+    """Write the genre tree as compact JSON, indented if GENRE_TREE_PRETTY is set."""
+    pretty = bool(os.environ.get("GENRE_TREE_PRETTY"))
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(dict(genre_tree), option=option))
+    else:
+        with open(path, "w") as f:
+            if pretty:
+                json.dump(genre_tree, f, indent=2)
+            else:
+                json.dump(genre_tree, f, separators=(",", ":"))
 
 
 def split_and_normalize_genres(genre_string):
-    # Split by common delimiters: '/', ';', and spaces between genres
-    split_genres = re.split(r"[;/]", genre_string)
-    # Normalize: trim whitespace and convert to lowercase
-    return [genre.strip().lower() for genre in split_genres]
+    # Split by common delimiters: '/' is mapped onto ';' and split once
+    split_genres = genre_string.translate(_GENRE_DELIMITERS).split(";")
+    # Normalize: trim whitespace, convert to lowercase and drop empty parts
+    normalized = (genre.strip().lower() for genre in split_genres)
+    return [genre for genre in normalized if genre]
 
 
 def collect_genres():
     # Example: Replace with your actual list of genres from the database
-    cursor = create_cursor()
+    cursor = create_cursor(row_factory=scalar_row)
 
+    # Only the distinct genre strings leave the database, they are split and
+    # normalized in Python where lower() and strip() are Unicode aware
     SQL_GENRES = "SELECT DISTINCT genre FROM tracks WHERE genre IS NOT NULL;"
-    results = execute_query(
+    genres = execute_query(
         cursor, SQL_GENRES, params="", fetch_one=False, fetch_all=True
     )
-
-    genres = [tup[0] for tup in results]
-
-    normalized_genres = []
-    for genre in genres:
-        normalized_genres.extend(split_and_normalize_genres(genre))
+    close_cursor(cursor)
 
     # Step 2: Count occurrences of each genre
-    genre_counts = Counter(normalized_genres)
+    genre_counts = Counter(
+        genre
+        for genre_string in genres
+        for genre in split_and_normalize_genres(genre_string)
+    )
 
     # Step 3: Categorize genres into high-level categories
     genre_tree = defaultdict(list)
@@ -70,19 +100,17 @@ def collect_genres():
         # Add more high-level categories as needed
     }
 
-    # Assign genres to categories
+    # Assign genres to categories through a subgenre -> category lookup
+    subgenre_categories = {
+        subgenre: category
+        for category, subgenres in high_level_categories.items()
+        for subgenre in subgenres
+    }
     for genre, count in genre_counts.items():
-        found = False
-        for category, subgenres in high_level_categories.items():
-            if genre in subgenres:
-                genre_tree[category].append({"genre": genre, "count": count})
-                found = True
-                break
-        if not found:
-            genre_tree["uncategorized"].append({"genre": genre, "count": count})
+        category = subgenre_categories.get(genre, "uncategorized")
+        genre_tree[category].append({"genre": genre, "count": count})
 
     # Step 4: Save the categorized tree to a file
-    with open("genre_tree.json", "w") as f:
-        json.dump(genre_tree, f, indent=4)
+    dump_genre_tree(genre_tree, "genre_tree.json")
 
     print("Genre tree saved to 'genre_tree.json'")
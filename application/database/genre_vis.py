@@ -39,17 +39,24 @@ with open(file_path, "r") as f:
 # Create a directed graph
 G = nx.DiGraph()
 
-# Add nodes and edges to the graph
+# Collect nodes and edges first and add them to the graph in bulk
+nodes = []
+edges = []
 for category, genres in genre_tree.items():
     if category == "uncategorized":
         category = "Uncategorized"  # Label for uncategorized group
-    G.add_node(category, label=category, color="blue", shape="box")
+    nodes.append(
+        (category, {"label": category, "color": "blue", "shape": "box"})
+    )
 
     for genre_entry in genres:
         genre = genre_entry["genre"]
         count = genre_entry["count"]
-        G.add_node(genre, label=f"{genre} ({count})", color="green")
-        G.add_edge(category, genre)
+        nodes.append((genre, {"label": f"{genre} ({count})", "color": "green"}))
+        edges.append((category, genre))
+
+G.add_nodes_from(nodes)
+G.add_edges_from(edges)
 
 # Create a Pyvis network for visualization
 net = Network(notebook=True, directed=True)
@@ -51,6 +51,8 @@ CREATE TABLE albums (
     secondary_types text[],
     tags text[],
     folder_path text,
+    cover_blob BLOB,
+    cover_path TEXT,
     FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
 );
 
@@ -218,3 +220,8 @@ CREATE TABLE tracks (
     FOREIGN KEY (artist_id) REFERENCES artists(artist_id)
 );
 
+
+CREATE INDEX idx_tracks_album ON tracks (album_id, track_number, title);
+CREATE INDEX idx_track_features_track_id ON track_features (track_id);
+CREATE INDEX idx_albums_folder_path ON albums (folder_path);
+CREATE INDEX idx_tags_track_id ON tags (track_id);
@@ -27,8 +27,8 @@
 """
 
 import asyncio
+import re
 import time
-from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 from textual.app import ComposeResult
@@ -53,9 +53,64 @@ from application.similarity.train_weights import (
     get_feature_vector,
     map_rating_to_similarity,
 )
-from application.updater.updater_main import get_audio_path_from_track_id
+from application.updater.updater_main import (
+    get_audio_paths_bulk,
+    translate_audio_path,
+)
 from application.utils.config_loader import load_config, update_weight_config
 
+# Track numbers in the regular "number/total" form
+_TN_RE = re.compile(r"^(\d+)/(\d+)$")
+
+try:
+    from numba import njit
+except ImportError:  # Fall back to the NumPy epoch
+    njit = None
+
+
+def _epoch_numpy(diff, weights, targets, learning_rate):
+    """Run one gradient descent epoch, return the new weights and the loss."""
+    # Weighted Euclidean distance of every rated track to the origin
+    weighted_diff = diff * weights
+    predicted_similarity = np.sqrt((weighted_diff * weighted_diff).sum(axis=1))
+
+    # Compute errors (difference between feedback rating and predicted similarity)
+    error = targets - predicted_similarity
+
+    # Update weights with the gradient summed over all tracks
+    gradient = ((-2 * error)[:, None] * diff).sum(axis=0)
+
+    # Clip weights to prevent negative values
+    new_weights = np.clip(weights - learning_rate * gradient, 0.0, 2.0)
+    return new_weights, float(np.dot(error, error))
+
+
+if njit is not None:
+
+    @njit(cache=True, fastmath=True)
+    def _epoch(diff, weights, targets, learning_rate):
+        """Same math as _epoch_numpy, compiled to native loops."""
+        rows, dims = diff.shape
+        gradient = np.zeros(dims)
+        total_loss = 0.0
+        for i in range(rows):
+            distance = 0.0
+            for j in range(dims):
+                weighted = diff[i, j] * weights[j]
+                distance += weighted * weighted
+            error = targets[i] - np.sqrt(distance)
+            for j in range(dims):
+                gradient[j] += -2.0 * error * diff[i, j]
+            total_loss += error * error
+        new_weights = np.empty(dims)
+        for j in range(dims):
+            weight = weights[j] - learning_rate * gradient[j]
+            new_weights[j] = min(max(weight, 0.0), 2.0)
+        return new_weights, total_loss
+
+else:
+    _epoch = _epoch_numpy
+
 
 class TrackTableWidget(DataTable):
     """A widget to display tracks of a selected album."""
@@ -108,20 +163,21 @@ class TrackTableWidget(DataTable):
 
         tracks = execute_query(
             cursor,
-            "SELECT track_id, track_number, title FROM tracks WHERE album_id = ? ORDER BY CAST(SUBSTR(track_number, 1, INSTR(track_number, '/') - 1) AS INTEGER);",
+            "SELECT track_id, track_number, title, path FROM tracks WHERE album_id = ? ORDER BY CAST(SUBSTR(track_number, 1, INSTR(track_number, '/') - 1) AS INTEGER);",
             (album_id,),
             fetch_one=False,
             fetch_all=True,
         )
+        # The paths come with the tracks, only the local translation is left
+        translate_config = load_config()["local_translate_audio_path"]
         playlist = []
-        for track_id, track_number, title in tracks:
+        for track_id, track_number, title, path in tracks:
             self.add_row(
                 str(track_number),
-                title.replace("[", r"\["),
+                title.replace("[", r"\[") if "[" in title else title,
                 key=f"{track_id}",
             )
-            path = get_audio_path_from_track_id(cursor, track_id)
-            playlist.append(path)
+            playlist.append(translate_audio_path(path, translate_config))
 
         if len(playlist) > 0:
             audio_player = self.app.query_one("#audio-player")
@@ -199,11 +255,13 @@ class PlaylistWidget(DataTable):
         path: str,
         similarity: str = None,
     ):
-        track_num, total_tracks = track_number.split("/")
-        track_number = f"{int(track_num):02}/{total_tracks}"  # Add leading zero
+        match = _TN_RE.match(track_number)
+        if match:
+            # Add leading zero
+            track_number = f"{match.group(1).zfill(2)}/{match.group(2)}"
 
         if release_date:
-            release_date = str(release_date).rstrip("-")
+            release_date = release_date.rstrip("-")
         """Add a track to the playlist."""
         if similarity is None:
             self.add_row(
@@ -282,18 +340,9 @@ class PlaylistWidget(DataTable):
                 self.last_click_time = current_time
 
     def get_playlist(self):
-        playlist = []
-
-        for row in self.rows:
-            path = get_audio_path_from_track_id(self.cursor, row.value)
-            playlist.append((row.value, path))
-        return playlist
-
-    def is_in_playlist(self, id):
-        for row in self.rows:
-            if row.value == id:
-                return True
-        return False
+        track_ids = [row.value for row in self.rows]
+        paths = get_audio_paths_bulk(self.cursor, track_ids)
+        return [(track_id, paths.get(int(track_id))) for track_id in track_ids]
 
     def do_training(self):
         self.in_training = True
@@ -325,21 +374,19 @@ class PlaylistWidget(DataTable):
             worker = TrainFeatureWeightsWorker(train_screen)
             worker.init_training(self.cursor, training_data, origin_track)
 
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future1 = executor.submit(
-                    worker.train_feature_weights,
-                    self.similar_tracks,
-                    training_data,
-                    origin_track,
-                    initial_learning_rate=0.01,
-                    max_epochs=400,
-                    patience=10,
-                )
-                result1 = future1.result()
-                if worker.new_weights:
-                    update_weight_config(worker.new_weights)
-                    build_ann_index(self.cursor, worker.new_weights)
-                    train_screen.update_pretty_config()
+            # The call blocked on the result anyway, run it without an executor
+            worker.train_feature_weights(
+                self.similar_tracks,
+                training_data,
+                origin_track,
+                initial_learning_rate=0.01,
+                max_epochs=400,
+                patience=10,
+            )
+            if worker.new_weights:
+                update_weight_config(worker.new_weights)
+                build_ann_index(self.cursor, worker.new_weights)
+                train_screen.update_pretty_config()
 
 
 class TrainFeatureWeightsWorker:
@@ -348,13 +395,30 @@ class TrainFeatureWeightsWorker:
         self.new_weights = None
 
     def init_training(self, cursor, feedback, origin_track):
-        feedback_vectors = {}
-        origin_vector = get_feature_vector(cursor, origin_track)
-        feedback_vectors[origin_track] = origin_vector
-        for idx, (track_id, rating) in enumerate(feedback.items()):
-            track_vector = get_feature_vector(cursor, track_id)
-            feedback_vectors[track_id] = track_vector
-        self.feedback_vectors = feedback_vectors
+        # One contiguous row per feedback entry, in feedback order
+        track_ids = list(feedback)
+        origin_vector = np.asarray(
+            get_feature_vector(cursor, origin_track), dtype=np.float64
+        )
+        self.V = np.asarray(
+            [get_feature_vector(cursor, track_id) for track_id in track_ids],
+            dtype=np.float64,
+        ).reshape(len(track_ids), origin_vector.size)
+        self.origin_v = origin_vector
+        # Rows that take part in the training, origin and unrated tracks do not,
+        # selected once so the epochs run without any per-row branches
+        valid = np.fromiter(
+            (
+                track_id != origin_track and rating != -1
+                for track_id, rating in feedback.items()
+            ),
+            dtype=bool,
+            count=len(feedback),
+        )
+        self.V_valid = self.V[valid]
+        # Feedback index of every valid row for the similarity lookup
+        self.targets_base_idx = np.flatnonzero(valid)
+        self.has_any = bool(valid.any())
         self.new_weights = None
 
     def train_feature_weights(
@@ -367,9 +431,33 @@ class TrainFeatureWeightsWorker:
         patience=10,
     ):
         config = load_config()
-        similar_tracks_similarity = [x[1] for x in similar_tracks]
-        weights = [details["weight"] for feature, details in config["features"].items()]
-        origin_vector = self.feedback_vectors[origin_track]
+        similar_tracks_similarity = np.asarray(
+            [x[1] for x in similar_tracks], dtype=np.float64
+        )
+        weights = np.asarray(
+            [details["weight"] for feature, details in config["features"].items()],
+            dtype=np.float64,
+        )
+        # Nothing to learn from, keep the current weights and skip the epochs
+        if not self.has_any or weights.size == 0:
+            self.new_weights = None
+            self.screen.post_message(ScreenUpdate(status="No valid feedback"))
+            return
+
+        # Map ratings to target similarities and compute the constant
+        # feature differences once, the epochs then run as whole-array ops
+        ratings = list(feedback.values())
+        targets = map_rating_to_similarity(
+            similar_tracks_similarity[self.targets_base_idx - 1],
+            [ratings[idx] for idx in self.targets_base_idx],
+        )
+        diff = self.origin_v - self.V_valid
+        # The numba epoch runs without bounds checks, a mismatch would read garbage
+        if weights.size != diff.shape[1]:
+            raise ValueError(
+                f"{weights.size} feature weights configured, but the feature "
+                f"vectors have {diff.shape[1]} values"
+            )
 
         # Display header
         best_loss = float("inf")
@@ -387,43 +475,7 @@ class TrainFeatureWeightsWorker:
         feedback_str = "Training completed! Press any key to exit."
 
         for epoch in range(max_epochs):
-            total_loss = 0
-            for idx, (track_id, rating) in enumerate(feedback.items()):
-                if track_id == origin_track or rating == -1:
-                    continue  # Skip the origin track or invalid ratings
-
-                # Get the track feature vector
-                track_vector = self.feedback_vectors[track_id]
-
-                # Map rating to target similarity (-1 to 1)
-                target_similarity = map_rating_to_similarity(
-                    similar_tracks_similarity[idx - 1], rating
-                )
-
-                # Calculate weighted distance (Euclidean)
-                origin_vector = np.array(
-                    origin_vector
-                )  # Ensure origin_vector is a NumPy array
-                track_vector = np.array(track_vector)
-
-                weighted_diff = weights * (origin_vector - track_vector)
-
-                predicted_similarity = np.sqrt(
-                    np.sum(weighted_diff**2)
-                )  # Negative distance for similarity
-
-                # Compute error (difference between feedback rating and predicted similarity)
-                error = target_similarity - predicted_similarity
-
-                # Update weights (gradient descent)
-                gradient = -2 * error * (origin_vector - track_vector)
-                weights -= learning_rate * gradient
-
-                # Clip weights to prevent negative values
-                weights = np.clip(weights, 0.0, 2.0)
-
-                # Accumulate loss for monitoring
-                total_loss += error**2
+            weights, total_loss = _epoch(diff, weights, targets, learning_rate)
 
             # Check for early stopping
             if total_loss < best_loss:
@@ -38,6 +38,7 @@ from textual.widgets import Label, OptionList, Sparkline
 from textual.widgets.option_list import Option
 from textual_slider import Slider
 
+from application.database.database_helper import scalar_row
 from application.gui.events import CustomClickEvent
 
 
@@ -191,14 +192,16 @@ def distribution_of_feature(feature):
     database_path = "database/paula.sqlite"
     connection = sqlite3.connect(database_path)
     cursor = connection.cursor()
-    sql = "SELECT count FROM feature_distribution WHERE feature_name = ?;"
+    # Fetch the single column as plain values instead of 1-tuples
+    cursor.row_factory = scalar_row
+    sql = "SELECT count FROM feature_distribution WHERE feature_name = ? ORDER BY id;"
     cursor.execute(
         sql,
         (feature,),
     )
     results = cursor.fetchall()
     connection.close()
-    return [tup[0] for tup in results]
+    return results
 
 
 class SpinalTapApp(App):
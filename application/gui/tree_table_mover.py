@@ -3,9 +3,10 @@ from textual.containers import Container, Grid, Horizontal
 from textual.screen import ModalScreen
 from textual.widgets import Button, Label
 
-from application.database.database_helper import get_tracks_by_id
+from application.database.database_helper import get_tracks_by_id, get_tracks_by_ids
 from application.similarity.similarity_main import get_similar_tracks_by_id
-from application.updater.updater_main import get_audio_path_from_track_id
+from application.updater.updater_main import translate_audio_path
+from application.utils.config_loader import load_config
 
 
 class TrainingConfirmScreen(ModalScreen[bool]):
@@ -85,6 +86,7 @@ class TreeTableMoverWidget(Container):
 
             playlist_table.clear_table()
 
+            translate_config = load_config()["local_translate_audio_path"]
             for (
                 track_id,
                 track_number,
@@ -98,7 +100,7 @@ class TreeTableMoverWidget(Container):
                 artist_id,
                 artist_name,
             ) in tracks:
-                path = get_audio_path_from_track_id(self.cursor, track_id)
+                path = translate_audio_path(path, translate_config)
                 playlist_table.add_track(
                     str(track_id),
                     track_number,
@@ -131,10 +133,23 @@ class TreeTableMoverWidget(Container):
             playlist_table.clear_table()
             similar_tracks = get_similar_tracks_by_id(self.cursor, id)
             similar_tracks.insert(0, (id, 0.0))
+            translate_config = load_config()["local_translate_audio_path"]
+            # Fetch all similar tracks in one query instead of one per track
+            tracks = get_tracks_by_ids(
+                self.cursor, [sim_tracks[0] for sim_tracks in similar_tracks]
+            )
+            tracks_by_id = {track[0]: track for track in tracks}
+            # Skip similar tracks removed from tracks since, e.g. by a cleanup,
+            # the training expects one similar track per table row
+            similar_tracks = [
+                sim_tracks
+                for sim_tracks in similar_tracks
+                if int(sim_tracks[0]) in tracks_by_id
+            ]
             playlist_table.similar_tracks = similar_tracks
             for sim_tracks in similar_tracks:
-                track = get_tracks_by_id(self.cursor, sim_tracks[0], "track_id")[0]
-                path = get_audio_path_from_track_id(self.cursor, track[0])
+                track = tracks_by_id[int(sim_tracks[0])]
+                path = translate_audio_path(track[5], translate_config)  # path
                 playlist_table.add_track(
                     str(track[0]),  # track_id
                     track[1],  # track_number
@@ -31,24 +31,34 @@ import logging
 import os
 import signal
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 
 from mutagen.flac import FLAC
-from mutagen.id3 import ID3, ID3TimeStamp
+from mutagen.id3 import ID3TimeStamp
 from mutagen.mp3 import MP3
 
 from application.database.database_helper import (
+    InsertError,
+    bulk_insert_tracks,
+    clear_id_caches,
     close_connection,
     close_cursor,
     commit,
     create_cursor,
-    execute_query,
+    defer_indexes,
+    ensure_indexes,
     execute_query_print_out,
+    finalize_bulk_import,
     get_connection,
     insert_album,
     insert_artist,
-    insert_tag,
+    insert_tags_bulk,
     insert_track,
+    prepare_for_bulk_import,
+    restore_indexes,
 )
 from application.utils.config_loader import load_config
 
@@ -76,6 +86,13 @@ def signal_handler(sig, frame):
 
 
 PROGRESS_FILE = "import_progress.csv"
+READ_AHEAD_FILES = 16
+READ_AHEAD_WORKERS = 4
+# Tables whose secondary indexes are dropped during an import
+BULK_LOAD_TABLES = ("tracks", "tags")
+
+# File statuses not yet written to the progress file
+pending_status = {}
 
 
 def get_folder_from_file_path(file_path):
@@ -111,14 +128,22 @@ def get_files_by_status(status):
 
 
 def update_file_status(file_path, status):
-    """Update the status of a file in the progress file."""
+    """Record the status of a file, written by the next flush_file_status."""
+    pending_status[file_path] = status
+
+
+def flush_file_status():
+    """Write all recorded file statuses to the progress file in one pass."""
+    if not pending_status:
+        return
     updated_rows = []
     with open(PROGRESS_FILE, mode="r", newline="", encoding="utf-8") as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
-            if row["file_path"] == file_path:
-                row["status"] = status
+            if row["file_path"] in pending_status:
+                row["status"] = pending_status[row["file_path"]]
             updated_rows.append(row)
+    pending_status.clear()
 
     # Write updated rows back to the CSV
     with open(PROGRESS_FILE, mode="w", newline="", encoding="utf-8") as csvfile:
@@ -127,47 +152,6 @@ def update_file_status(file_path, status):
         writer.writerows(updated_rows)
 
 
-def record_progress(file_path, status):
-    execute_query(
-        """
-        INSERT INTO import_progress (file_path, status, retry_count)
-        VALUES (%s, %s, 0)
-        ON CONFLICT (file_path) DO UPDATE
-        SET status = EXCLUDED.status,
-            retry_count = import_progress.retry_count + 1,
-            last_attempt = CURRENT_TIMESTAMP;
-        """,
-        (file_path, status),
-    )
-
-
-def get_pending_files(directory):
-    """Retrieve a list of pending files from the database."""
-    result = execute_query(
-        """
-        SELECT file_path FROM import_progress WHERE status = 'pending';
-        """,
-        fetch_all=True,
-    )
-    tracked_files = {row["file_path"] for row in result}
-
-    # Find files in the directory not yet tracked
-    all_files = set()
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith((".mp3", ".flac")):
-                all_files.add(os.path.join(root, file))
-
-    # Add untracked files to the progress table
-    new_files = all_files - tracked_files
-    for file_path in new_files:
-        print(file_path)
-        record_progress(file_path, "pending")
-
-    # Return all pending files
-    return list(tracked_files)
-
-
 def extract_valid_uuids(value):
     valid_uuids = []
     for part in value.split("/"):
@@ -190,36 +174,43 @@ def get_tag(metadata, key, default=None):
     return default
 
 
-def process_audio_file(cursor, file_path):
+def read_audio_tags(file_path):
+    """Load the tags of an MP3 or FLAC file, returns (tags, musicbrainz_tags)."""
+    musicbrainz_tags = {}
+    # Detect file type and load metadata
+    if file_path.lower().endswith(".mp3"):
+        audio = MP3(file_path)
+        for frame in audio.keys():
+            if frame.startswith("TXXX:MusicBrainz"):
+                musicbrainz_tags[frame.replace("TXXX:", "")] = audio[frame].text[0]
+    elif file_path.lower().endswith(".flac"):
+        audio = FLAC(file_path)
+        for tag in audio:
+            if tag.startswith("musicbrainz_"):
+                musicbrainz_tags[tag] = (
+                    audio[tag][0] if isinstance(audio[tag], list) else audio[tag]
+                )
+    else:
+        return None
+    return audio.tags, musicbrainz_tags
+
+
+def process_audio_file(cursor, file_path, pending_tracks, tags_future=None):
     logger.info(f"Processing: {file_path}")
     folder = get_folder_from_file_path(file_path)
 
     try:
-        # Determine file type and load metadata
-        audio = None
-
-        musicbrainz_tags = {}
-        # Detect file type and load metadata
-        if file_path.lower().endswith(".mp3"):
-            audio = MP3(file_path)
-            metadata = ID3(file_path)
-            for frame in audio.keys():
-                if frame.startswith("TXXX:MusicBrainz"):
-                    musicbrainz_tags[frame.replace("TXXX:", "")] = audio[frame].text[0]
-        elif file_path.lower().endswith(".flac"):
-            audio = FLAC(file_path)
-            metadata = audio
-            for tag in audio:
-                if tag.startswith("musicbrainz_"):
-                    musicbrainz_tags[tag] = (
-                        audio[tag][0] if isinstance(audio[tag], list) else audio[tag]
-                    )
+        # Tags may already be read ahead by run_import
+        if tags_future is not None:
+            audio_tags = tags_future.result()
         else:
+            audio_tags = read_audio_tags(file_path)
+        if audio_tags is None:
             logger.error(f"Unsupported file format: {file_path}")
             return
 
         # Extract metadata
-        metadata = audio.tags
+        metadata, musicbrainz_tags = audio_tags
         # # Check if tags exist and print the keys
         # if metadata:
         #     print("Keys in audio tags:")
@@ -263,15 +254,17 @@ def process_audio_file(cursor, file_path):
                 raw_year_str = (
                     str(raw_year) if isinstance(raw_year, ID3TimeStamp) else raw_year
                 )
-                # Convert to a valid date (default to January 1st)
-                year = datetime.strptime(raw_year_str[:4], "%Y").date()
+                # Convert to a valid date (default to January 1st), bound as ISO text
+                year = datetime.strptime(raw_year_str[:4], "%Y").date().isoformat()
             except ValueError:
                 logger.error(f"Invalid year format: {raw_year}. Skipping year.")
 
         release_date = get_tag(metadata, "TXXX:originalyear")
         if release_date:
             try:
-                release_date = datetime.strptime(release_date[:4], "%Y").date()
+                release_date = (
+                    datetime.strptime(release_date[:4], "%Y").date().isoformat()
+                )
             except ValueError:
                 logger.error(
                     f"Invalid release_date format: {release_date}. Skipping release_date."
@@ -334,8 +327,8 @@ def process_audio_file(cursor, file_path):
             folder,
         )
 
-        track_id = insert_track(
-            cursor,
+        # The track is inserted with the rest of the batch by flush_pending_tracks
+        track_row = (
             track_title,
             artist_id,
             album_id,
@@ -345,29 +338,60 @@ def process_audio_file(cursor, file_path):
             file_path,
             musicbrainz_release_track_id,
             track_mb_id_valid,
+            "0:00",
         )
-
-        if track_id:
-            for key in metadata.keys():
-                if key.startswith("TXXX"):
-                    insert_tag(cursor, track_id, key, get_tag(metadata, key))
-
-        update_file_status(file_path, "imported")
+        tag_values = []
+        for key in metadata.keys():
+            if key.startswith("TXXX"):
+                value = get_tag(metadata, key)
+                if value is not None:
+                    tag_values.append((key, value))
+        pending_tracks.append((track_row, tag_values, file_path))
     except Exception as e:
         logger.error(f"Error processing {file_path}: {e}")
         update_file_status(file_path, "error")
 
 
-def get_error_files(max_retries=3):
-    result = execute_query(
-        """
-        SELECT file_path FROM import_progress
-        WHERE status = 'error' AND retry_count < %s;
-        """,
-        (max_retries,),
-        fetch_all=True,
+def flush_pending_tracks(cursor, pending_tracks):
+    """Insert the buffered tracks and their tags, then mark the files imported."""
+    if not pending_tracks:
+        return
+    try:
+        # Rows are streamed from a generator, bulk_insert_tracks only holds
+        # one statement chunk at a time
+        track_ids = bulk_insert_tracks(
+            cursor, (track_row for track_row, _, _ in pending_tracks)
+        )
+    except InsertError:
+        # One bad row fails its whole statement, retry row by row so only that
+        # file is marked as error, the upsert returns rows already inserted
+        track_ids = {}
+        for track_row, _, file_path in pending_tracks:
+            try:
+                track_ids[track_row[7]] = insert_track(cursor, *track_row)
+            except InsertError as e:
+                logger.error(f"Error processing {file_path}: {e}")
+                update_file_status(file_path, "error")
+
+    # Tracks are mapped back to their files by MusicBrainz id
+    imported = [
+        (track_ids[track_row[7]], tag_values, file_path)
+        for track_row, tag_values, file_path in pending_tracks
+        if track_row[7] in track_ids
+    ]
+    # Streamed into executemany, no intermediate list of tag rows
+    insert_tags_bulk(
+        cursor,
+        (
+            (track_id, key, value)
+            for track_id, tag_values, _ in imported
+            if track_id
+            for key, value in tag_values
+        ),
     )
-    return [row["file_path"] for row in result]
+    for _, _, file_path in imported:
+        update_file_status(file_path, "imported")
+    pending_tracks.clear()
 
 
 def run_import(directory, retry_errors=False):
@@ -383,15 +407,58 @@ def run_import(directory, retry_errors=False):
         files_to_process = get_files_by_status("error")
     else:
         files_to_process = get_files_by_status("pending")
+    batch_size = config["application"]["batch_size"]
     cursor = create_cursor()
-    for file_path in files_to_process:
-
-        if stop_import:
-            logger.info("Import stopped by user.")
-            break
-        process_audio_file(cursor, file_path)
+    # Read the tags of upcoming files while the current one is written
+    pending_files = iter(files_to_process)
+    read_ahead = deque()
+    # Tracks parsed in the current batch, inserted together at the batch end
+    pending_tracks = []
+    prepare_for_bulk_import()
+    # Build the secondary indexes once after the load instead of per row
+    deferred_indexes = []
+    for table in BULK_LOAD_TABLES:
+        deferred_indexes.extend(defer_indexes(cursor, table))
+    try:
+        with ThreadPoolExecutor(max_workers=READ_AHEAD_WORKERS) as executor:
+            for file_path in islice(pending_files, READ_AHEAD_FILES):
+                read_ahead.append(
+                    (file_path, executor.submit(read_audio_tags, file_path))
+                )
+            index = 0
+            while read_ahead:
+
+                if stop_import:
+                    logger.info("Import stopped by user.")
+                    for _, future in read_ahead:
+                        future.cancel()
+                    break
+                file_path, tags_future = read_ahead.popleft()
+                next_file = next(pending_files, None)
+                if next_file is not None:
+                    read_ahead.append(
+                        (next_file, executor.submit(read_audio_tags, next_file))
+                    )
+                process_audio_file(cursor, file_path, pending_tracks, tags_future)
+                index += 1
+                # Insert and commit per batch instead of per file to avoid a
+                # statement and a WAL sync per track
+                if index % batch_size == 0:
+                    flush_pending_tracks(cursor, pending_tracks)
+                    commit()
+                    flush_file_status()
+        flush_pending_tracks(cursor, pending_tracks)
         commit()
-
-    close_cursor(cursor)
+        flush_file_status()
+    except Exception:
+        conn.rollback()
+        clear_id_caches()
+        raise
+    finally:
+        restore_indexes(cursor, deferred_indexes)
+        # Also recreates indexes left dropped by an import that was killed
+        ensure_indexes()
+        close_cursor(cursor)
+        finalize_bulk_import()
     close_connection()
     logger.info("Import complete.")
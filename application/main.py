@@ -46,6 +46,7 @@ from application.database.database_helper import (
     backup_database,
     clean_tables,
     close_connection,
+    initialize_schema,
     restore_database,
 )
 from application.importer.importer_main import run_import
@@ -173,6 +174,8 @@ def main():
         setup_logging(args.log.upper())
         logger = logging.getLogger(__name__)
         logger.info("Application started")
+        # Creates missing tables and indexes once per schema version
+        initialize_schema()
 
         if args.command == "import":
             if args.clean:
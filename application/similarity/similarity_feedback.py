@@ -42,7 +42,7 @@ def display_tracks_and_collect_feedback(cursor, from_track_id, tracks):
     ratings = {}
     ratings[from_track_id] = -1
 
-    origin_track = get_track_by_id(cursor, from_track_id)
+    origin_track = get_track_by_id(cursor, from_track_id, as_dict=True)
 
     def curses_ui(stdscr):
         curses.start_color()
@@ -71,7 +71,7 @@ def display_tracks_and_collect_feedback(cursor, from_track_id, tracks):
         stdscr.addstr("\n\nRate Tracks (1-5). Press 'q' to quit.\n", curses.A_BOLD)
 
         for idx, track_id in enumerate(tracks):
-            similar_track = get_track_by_id(cursor, track_id)
+            similar_track = get_track_by_id(cursor, track_id, as_dict=True)
             title = (
                 similar_track["track_title"][:17] + "..."
                 if len(similar_track["track_title"]) > 20
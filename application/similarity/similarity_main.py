@@ -617,7 +617,7 @@ def run_similarity(do_normalize, input_query, do_train):
     config = load_config()
     temp_dir = Path(config["temp_dir"])
     net = Network(height="750px", width="100%", notebook=False)
-    cursor = create_cursor(asrow=True)
+    cursor = create_cursor()
     max_recursion_level = 1
     if do_normalize:
         precompute_features(cursor)
@@ -680,14 +680,14 @@ def track_similarity_processing(
 
     similar_tracks = get_similar_tracks_by_id(cursor, track)
 
-    main_track = get_track_by_id(cursor, track)
+    main_track = get_track_by_id(cursor, track, as_dict=True)
     if do_m3u:
         file_paths.append(main_track["title_path"])
     getnode(net, main_track, 1.0, main_track["track_id"], is_similary=False)
 
     print_track(main_track, print_path=False)
     for sim_track in similar_tracks:
-        sim_track_result = get_track_by_id(cursor, sim_track[0])
+        sim_track_result = get_track_by_id(cursor, sim_track[0], as_dict=True)
 
         print_track(sim_track_result, print_path=False, is_similary=True)
         if do_m3u:
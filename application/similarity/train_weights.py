@@ -104,13 +104,15 @@ def map_rating_to_similarity(similarity, rating, adjustment_factor=0.2):
     """
     Adjust the target similarity based on rating.
 
+    Works element-wise when similarity and rating are arrays.
+
     :param similarity: Original similarity (e.g., negative Euclidean distance).
     :param rating: User-provided rating (1 to 5).
     :param adjustment_factor: Small factor to adjust similarity.
     :return: Adjusted target similarity.
     """
     # Calculate the adjustment (rating - 3 determines direction and magnitude)
-    adjustment = float(rating) * adjustment_factor
+    adjustment = np.asarray(rating, dtype=np.float64) * adjustment_factor
 
     # Adjust the target similarity
     target_similarity = similarity + adjustment
@@ -131,7 +133,25 @@ def train_feature_weights_curses(
     config = load_config()
     similar_tracks_similarity = [x[1] for x in similar_tracks]
     weights = [details["weight"] for feature, details in config["features"].items()]
-    origin_vector = get_feature_vector(cursor, origin_track)
+    # Convert the feature vectors once, they do not change between epochs
+    origin_vector = np.asarray(
+        get_feature_vector(cursor, origin_track), dtype=np.float64
+    )
+    # Skip the origin track and invalid ratings once instead of every epoch
+    valid_feedback = [
+        (idx, track_id, rating)
+        for idx, (track_id, rating) in enumerate(feedback.items())
+        if track_id != origin_track and rating != -1
+    ]
+    track_vectors = {
+        track_id: np.asarray(get_feature_vector(cursor, track_id), dtype=np.float64)
+        for _, track_id, _ in valid_feedback
+    }
+    # Map ratings to target similarities (-1 to 1) once for all epochs
+    target_similarities = {
+        track_id: map_rating_to_similarity(similar_tracks_similarity[idx - 1], rating)
+        for idx, track_id, rating in valid_feedback
+    }
 
     curses.start_color()
     curses.curs_set(0)  # Enable cursor
@@ -150,24 +170,12 @@ def train_feature_weights_curses(
     feedback_str = "Training completed! Press any key to exit."
     for epoch in range(max_epochs):
         total_loss = 0
-        for idx, (track_id, rating) in enumerate(feedback.items()):
-            if track_id == origin_track or rating == -1:
-                continue  # Skip the origin track or invalid ratings
-
-            # Get the track feature vector
-            track_vector = get_feature_vector(cursor, track_id)
-
-            # Map rating to target similarity (-1 to 1)
-            target_similarity = map_rating_to_similarity(
-                similar_tracks_similarity[idx - 1], rating
-            )
+        for _, track_id, _ in valid_feedback:
+            # Get the track feature vector and its target similarity
+            track_vector = track_vectors[track_id]
+            target_similarity = target_similarities[track_id]
 
             # Calculate weighted distance (Euclidean)
-            origin_vector = np.array(
-                origin_vector
-            )  # Ensure origin_vector is a NumPy array
-            track_vector = np.array(track_vector)
-
             weighted_diff = weights * (origin_vector - track_vector)
 
             predicted_similarity = np.sqrt(
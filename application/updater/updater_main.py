@@ -29,6 +29,7 @@
 import concurrent.futures
 import csv
 import hashlib
+import json
 import logging
 import os
 import signal
@@ -41,11 +42,13 @@ from pathlib import Path
 import requests
 
 from application.database.database_helper import (
+    clear_id_caches,
     close_connection,
     close_cursor,
     commit,
     create_cursor,
     execute_query,
+    replace_tags,
     update_album_tags,
     update_track_tags,
 )
@@ -59,6 +62,9 @@ PROGRESS_FILE = "update_progress.csv"
 
 stop_update = False
 
+# Connection of a feature extraction worker process, reused for all its tracks
+_worker_conn = None
+
 
 # Signal handler for graceful interruption
 def signal_handler(sig, frame):
@@ -444,7 +450,7 @@ def update_track_metadata(
             SET is_musicbrainz_valid = FALSE
             WHERE track_id = ?;
         """
-        execute_query(query, (track_id,))
+        execute_query(cursor, query, (track_id,))
 
 
 def fetch_artist_tags(artist_id):
@@ -480,41 +486,51 @@ def fetch_artist_relationships(artist_id):
 
 def update_artist_tags(cursor, artist_id, tags):
     """Update tags for an artist in the database."""
-    # Remove existing tags
-    execute_query(cursor, "DELETE FROM artist_tags WHERE artist_id = ?;", (artist_id,))
-
-    # Insert new tags
-    for tag in tags:
-        execute_query(
-            cursor,
-            "INSERT INTO artist_tags (artist_id, tag) VALUES (?, ?) ON CONFLICT DO NOTHING;",
-            (artist_id, tag),
-        )
+    replace_tags(cursor, "artist_tags", "artist_id", artist_id, tags)
 
 
 def update_artist_relationships(cursor, artist_id, relationships):
     """Update relationships for an artist in the database."""
-    # Remove existing relationships
-    execute_query(
-        cursor, "DELETE FROM artist_relationships WHERE artist_id = ?;", (artist_id,)
+    existing = set(
+        execute_query(
+            cursor,
+            """
+            SELECT artist_id, related_artist_id, relationship_type
+            FROM artist_relationships WHERE artist_id = ?;
+            """,
+            (artist_id,),
+            fetch_all=True,
+        )
+        or []
     )
 
-    # Insert new relationships
+    relationship_rows = set()
     for relation in relationships:
         # Get related_artist_id from the database
         related_artist_id = get_artist_id_from_musicbrainz(
             cursor, relation["related_artist_id"]
         )
         if related_artist_id:
-            execute_query(
-                cursor,
-                """
-                INSERT INTO artist_relationships (artist_id, related_artist_id, relationship_type)
-                VALUES (?, ?, ?) ON CONFLICT DO NOTHING;
-                """,
-                (artist_id, related_artist_id, relation["relationship_type"]),
+            relationship_rows.add(
+                (artist_id, related_artist_id, relation["relationship_type"])
             )
 
+    # Only touch the relationships that changed
+    cursor.executemany(
+        """
+        DELETE FROM artist_relationships
+        WHERE artist_id = ? AND related_artist_id = ? AND relationship_type = ?;
+        """,
+        existing - relationship_rows,
+    )
+    cursor.executemany(
+        """
+        INSERT INTO artist_relationships (artist_id, related_artist_id, relationship_type)
+        VALUES (?, ?, ?) ON CONFLICT DO NOTHING;
+        """,
+        relationship_rows - existing,
+    )
+
 
 def get_artist_id_from_musicbrainz(cursor, musicbrainz_artist_id):
     """Get artist ID from MusicBrainz ID in the database."""
@@ -571,7 +587,7 @@ def fetch_with_retries(
     return None
 
 
-def fetch_and_update_wikidata_id(artist_id, musicbrainz_artist_id):
+def fetch_and_update_wikidata_id(cursor, artist_id, musicbrainz_artist_id):
     """Fetch Wikidata ID for an artist and update the database."""
     url = f"https://musicbrainz.org/ws/2/artist/{musicbrainz_artist_id}?inc=url-rels&fmt=json"
     config = load_config()
@@ -590,7 +606,7 @@ def fetch_and_update_wikidata_id(artist_id, musicbrainz_artist_id):
         if wikidata_url:
             wikidata_id = wikidata_url.split("/")[-1]  # Extract the ID from the URL
             query = "UPDATE artists SET wikidata_id = ? WHERE artist_id = ?;"
-            execute_query(query, (wikidata_id, artist_id))
+            execute_query(cursor, query, (wikidata_id, artist_id))
             logger.info(f"Updated Wikidata ID for artist {artist_id}: {wikidata_id}")
 
 
@@ -675,6 +691,9 @@ def process_entity(
                 # Mark as updated
                 update_item_status(entity_type, entity_id, "updated")
             except Exception as e:
+                # Otherwise the next entity's commit would keep the partial update
+                cursor.connection.rollback()
+                clear_id_caches()
                 logger.error(f"Failed to update {entity_type} ID {entity_id}: {e}")
                 update_item_status(entity_type, entity_id, "error")
         else:
@@ -977,27 +996,43 @@ def fetch_acousticbrainz_data_low(recording_id):
         return None
 
 
+def translate_audio_path(path, translate_config=None):
+    """Map a stored track path onto the local file system."""
+    if translate_config is None:
+        translate_config = load_config()["local_translate_audio_path"]
+    source = translate_config["source"]
+    if (
+        path is not None
+        and "tracks.path" in translate_config["fields"]
+        and path.startswith(source)
+    ):
+        return path.replace(source, translate_config["target"], 1)
+    return path
+
+
 def get_audio_path_from_track_id(cursor, track_id):
     query = f"SELECT path FROM tracks WHERE track_id IS {track_id};"
     results = execute_query(cursor, query, params="", fetch_one=False, fetch_all=True)
 
-    paths = [row[0] for row in results]
+    if results:
+        return translate_audio_path(results[0][0])
 
-    config = load_config()
-    translate_config = config["local_translate_audio_path"]
 
-    if "tracks.path" in translate_config["fields"]:
-        paths = [
-            (
-                s.replace(translate_config["source"], translate_config["target"], 1)
-                if s.startswith(translate_config["source"])
-                else s
-            )
-            for s in paths
-        ]
+def get_audio_paths_bulk(cursor, track_ids):
+    """Return a track_id -> audio path dict for many tracks in one query."""
+    query = (
+        "SELECT track_id, path FROM tracks "
+        "WHERE track_id IN (SELECT value FROM json_each(?));"
+    )
+    results = execute_query(
+        cursor, query, (json.dumps(list(track_ids)),), fetch_all=True
+    )
 
-    if paths:
-        return paths[0]
+    translate_config = load_config()["local_translate_audio_path"]
+    return {
+        track_id: translate_audio_path(path, translate_config)
+        for track_id, path in results
+    }
 
 
 def update_track_metadata_with_acousticbrainz(
@@ -1064,19 +1099,26 @@ def run_updater(scope, retry_errors, update_valid_entries, extract_features):
     logger.info("MusicBrainz updater completed.")
 
 
+def _get_worker_connection(db_path):
+    """Return the connection of the current worker process, opening it once."""
+    global _worker_conn
+    if _worker_conn is None:
+        _worker_conn = sqlite3.connect(db_path)
+        _worker_conn.row_factory = sqlite3.Row
+    return _worker_conn
+
+
 def extract_features_single(db_path, track_id):
     """
-    Extract features for a single track ID using a new database connection.
+    Extract features for a single track ID using the worker's database connection.
 
     Args:
         db_path (str): Path to the SQLite database file.
         track_id (int): The track ID to process.
     """
+    conn = _get_worker_connection(db_path)
+    cursor = conn.cursor()
     try:
-        # Create a new connection and cursor for the process
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
 
         # Feature extraction logic
         audio_path = get_audio_path_from_track_id(cursor, track_id)
@@ -1097,9 +1139,10 @@ def extract_features_single(db_path, track_id):
 
         conn.commit()  # Commit the transaction
     except Exception as e:
+        conn.rollback()
         print(f"Error processing track ID {track_id}: {e}")
     finally:
-        conn.close()  # Ensure the connection is closed
+        cursor.close()
 
 
 def extract_features():